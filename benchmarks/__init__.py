@@ -0,0 +1,22 @@
+"""
+Throughput benchmarks of the parser over synthetic lecture notes
+
+Usage: python -m benchmarks --help, from the root of the repository
+"""
+import importlib
+import sys
+import types
+from os import path
+
+src = path.join(path.dirname(path.dirname(path.abspath(__file__))), "src")
+
+def load_parser(name: str = "tex_cardify"):
+    """
+    The parser module of src, imported as a submodule of a package called
+    name. The add-on's __init__ needs a running Anki, so it is not executed
+    """
+    if name not in sys.modules:
+        package = types.ModuleType(name)
+        package.__path__ = [src]
+        sys.modules[name] = package
+    return importlib.import_module(name + ".parser")
@@ -0,0 +1,38 @@
+import json
+from argparse import ArgumentParser
+
+from .corpus import Corpus
+from .run import run
+
+def main(argv=None) -> dict:
+    arguments = ArgumentParser(prog="python -m benchmarks",
+                               description="Times the parser over synthetic lecture notes and prints the results as JSON")
+    arguments.add_argument("--sections", type=int, default=20, help="number of sections")
+    arguments.add_argument("--blocks", type=int, default=10, help="cst blocks per section")
+    arguments.add_argument("--subsections", type=int, default=2, help="subsections per section")
+    arguments.add_argument("--math", type=float, default=3, help="math per block")
+    arguments.add_argument("--minted", type=float, default=0.2, help="minted snippets per block")
+    arguments.add_argument("--itemize", type=float, default=0.5, help="itemize lists per block")
+    arguments.add_argument("--images", type=float, default=0.1, help="includegraphics per block")
+    arguments.add_argument("--seed", type=int, default=0)
+    arguments.add_argument("--repeat", type=int, default=5, help="timed runs, the fastest is kept")
+    arguments.add_argument("--save-corpus", metavar="FILE", help="also write the generated .tex")
+    arguments.add_argument("--output", metavar="FILE", help="write the JSON there instead of printing it")
+    options = arguments.parse_args(argv)
+
+    corpus = Corpus(options.sections, options.blocks, options.math, options.minted,
+                    options.itemize, options.images, options.subsections, options.seed)
+    text = corpus.text()
+    if options.save_corpus:
+        with open(options.save_corpus, "w", encoding="utf-8") as f:
+            f.write(text)
+    results = {"corpus": corpus.settings(), **run(text, options.repeat)}
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    return results
+
+if __name__ == "__main__":
+    main()
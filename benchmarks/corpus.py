@@ -0,0 +1,110 @@
+from random import Random
+
+################ Synthetic Lecture Notes ################
+
+_kinds = ["def", "thm", "eg", "exe", "rmk", "cor", "def*", "thm*"]
+_words = ("the of a set map group ring field space limit sequence function "
+          "continuous compact open closed bounded linear vector basis kernel "
+          "image order prime ideal module norm metric measure integral").split()
+_inline_math = [r"$x^{2} + y^{2} = z^{2}$", r"$f \colon X \to \R$",
+                r"$\lim_{n \to \infty} a_n = L$", r"$\{x \in A : x < 1\}$",
+                r"$\norm{v} \le \rank A$"]
+_display_math = [r"$$\int_0^1 f(x)\,dx = F(1) - F(0)$$",
+                 "\\begin{align*}\n  a &= b + c \\\\\n  &\\le \\frac{1}{2}\n\\end{align*}",
+                 "\\begin{equation}\n  \\sum_{k=1}^{n} k = \\frac{n(n+1)}{2}\n\\end{equation}"]
+_minted = {
+    "python": "def gcd(a, b):\n    while b:\n        a, b = b, a % b\n    return a\n",
+    "c": "int sum(int *xs, int n) {\n    int s = 0;\n    for (int i = 0; i < n; i++) s += xs[i];\n    return s;\n}\n",
+    "haskell": "fib :: Int -> Integer\nfib n = fibs !! n\n  where fibs = 0 : 1 : zipWith (+) fibs (tail fibs)\n",
+}
+_images = [r"\includegraphics{figure-{}.png}",
+           r"\includegraphics[width=0.5\textwidth]{figure-{}.png}",
+           r"\includegraphics[width=4cm, height=3cm]{plot-{}.pdf}"]
+
+_preamble = r"""\documentclass{article}
+\usepackage{amsmath, minted, graphicx}
+\newcommand{\R}{\mathbb{R}}
+\newcommand{\norm}[1]{\left\lVert #1 \right\rVert}
+\DeclareMathOperator{\rank}{rank}
+\begin{document}
+"""
+
+class Corpus:
+    """
+    Generates lecture notes of sections sections with blocks cst blocks
+    each. The densities are the expected number of math, minted, itemize
+    and includegraphics elements per block, split between the front and
+    the back. The same arguments always give the same text
+    """
+    def __init__(self, sections: int = 20, blocks: int = 10, math: float = 3,
+                 minted: float = 0.2, itemize: float = 0.5, images: float = 0.1,
+                 subsections: int = 2, seed: int = 0) -> None:
+        self.sections = sections
+        self.blocks = blocks
+        self.math = math
+        self.minted = minted
+        self.itemize = itemize
+        self.images = images
+        self.subsections = subsections
+        self.seed = seed
+
+    def settings(self) -> dict:
+        return dict(vars(self))
+
+    def text(self) -> str:
+        random = Random(self.seed)
+        out = [_preamble]
+        for i in range(self.sections):
+            out.append(f"\\section{{Section {i + 1}: {self._words(random, 3)}}}\n\n")
+            # the blocks after the first ones are spread over the subsections
+            step = -(-self.blocks // (self.subsections + 1))
+            for j in range(self.blocks):
+                if j > 0 and j % step == 0:
+                    out.append(f"\\subsection{{{self._words(random, 2)}}}\n\n")
+                out.append(self._block(random))
+        out.append("\\end{document}\n")
+        return "".join(out)
+
+    def _block(self, random: Random) -> str:
+        kind = random.choice(_kinds)
+        title = "" if kind.endswith("*") else "{" + self._words(random, 2) + " " + random.choice(_inline_math) + "}"
+        front = self._body(random, 0.5)
+        back = self._body(random, 0.5)
+        return f"\\begin{{cst{kind}}}{title}\n{front}\\end{{cst{kind}}}\n{back}\n"
+
+    def _body(self, random: Random, share: float) -> str:
+        out = [self._paragraph(random, share)]
+        for _ in range(self._count(random, self.itemize * share)):
+            items = "".join(f"  \\item {self._paragraph(random, share)}"
+                            for _ in range(random.randint(2, 4)))
+            out.append(f"\\begin{{itemize}}\n{items}\\end{{itemize}}\n")
+        for _ in range(self._count(random, self.minted * share)):
+            language = random.choice(sorted(_minted))
+            out.append(f"\\begin{{minted}}{{{language}}}\n{_minted[language]}\\end{{minted}}\n")
+        for _ in range(self._count(random, self.images * share)):
+            out.append(random.choice(_images).replace("{}", str(random.randint(1, 50))) + "\n")
+        return "".join(out)
+
+    def _paragraph(self, random: Random, share: float) -> str:
+        out = [self._words(random, random.randint(8, 20))]
+        for _ in range(self._count(random, self.math * share)):
+            if random.random() < 0.7:
+                out.append(random.choice(_inline_math))
+            else:
+                out.append("\n" + random.choice(_display_math) + "\n")
+            out.append(self._words(random, random.randint(3, 10)))
+        if random.random() < 0.3:
+            out.append(r"\textbf{" + self._words(random, 2) + "}")
+        return " ".join(out) + "\n\n"
+
+    @staticmethod
+    def _words(random: Random, n: int) -> str:
+        return " ".join(random.choice(_words) for _ in range(n))
+
+    @staticmethod
+    def _count(random: Random, density: float) -> int:
+        """A count with the expected value density"""
+        count = int(density)
+        if random.random() < density - count:
+            count += 1
+        return count
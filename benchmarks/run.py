@@ -0,0 +1,99 @@
+import platform
+import sys
+from time import perf_counter
+
+from . import load_parser
+
+################ Stub Handlers ################
+
+class StubHandlers:
+    """
+    Stands in for the Anki handlers: notes get increasing ids, and images
+    resolve to their name under media/
+    """
+    def __init__(self) -> None:
+        self.notes = 0
+        self.decks = set()
+
+    def handler_gen(self, deck: str):
+        self.decks.add(deck)
+        return self.handler
+
+    def handler(self, front: str, back: str, note_id=None) -> int:
+        if note_id is not None:
+            return note_id
+        self.notes += 1
+        return self.notes
+
+    @staticmethod
+    def file_handler(name: str) -> str:
+        return "media/" + name
+
+################ Timings ################
+
+def best_time(run, repeat: int) -> tuple:
+    """(the fastest of repeat runs after a warm up run, what it returned)"""
+    result = run()
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        result = run()
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def throughput(name: str, seconds: float, size: int, cards: int) -> dict:
+    return {
+        "name": name,
+        "seconds": seconds,
+        "cards": cards,
+        "cards_per_s": cards / seconds,
+        "mb_per_s": size / seconds / 1e6,
+    }
+
+def run(text: str, repeat: int = 5) -> dict:
+    """
+    Times split_regex, parser.parse, handle_split and parse_all over text.
+    Each rate is the text size (or the size of the rendered blocks) over the
+    fastest run
+    """
+    parser = load_parser()
+    size = len(text.encode("utf-8"))
+    blocks = parser.build_blocks(text)
+    block_size = sum(len(block.raw().encode("utf-8")) for block in blocks)
+    results = []
+
+    seconds, pairs = best_time(lambda: parser.split_regex(text, parser.cst_registry.regex), repeat)
+    # the text before the first block is not a card
+    cards = sum(pair.first is not None for pair in pairs)
+    results.append(throughput("split_regex", seconds, size, cards))
+
+    seconds, _ = best_time(lambda: [(parser.parser.parse(block.front.text()),
+                                     parser.parser.parse(block.back.text()))
+                                    for block in blocks], repeat)
+    results.append(throughput("parser.parse", seconds, block_size, len(blocks)))
+
+    def handle_split() -> int:
+        handlers = StubHandlers()
+        context = parser.RenderContext(handlers.file_handler)
+        for block in blocks:
+            parser.handle_split(block, handlers.handler, context)
+        return handlers.notes
+    seconds, notes = best_time(handle_split, repeat)
+    results.append(throughput("handle_split", seconds, block_size, notes))
+
+    def parse_all() -> int:
+        handlers = StubHandlers()
+        parser.parse_all(text, handlers.handler_gen, handlers.file_handler)
+        return handlers.notes
+    seconds, notes = best_time(parse_all, repeat)
+    results.append(throughput("parse_all", seconds, size, notes))
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "bytes": size,
+        "blocks": len(blocks),
+        "results": results,
+    }
@@ -0,0 +1,53 @@
+import json
+import sqlite3
+from os import path, makedirs
+
+class RenderCache:
+    """
+    Rendered front and back html of cst blocks in a sqlite database, keyed
+    by a hash of their source and the renderer version. Entries beyond
+    max_entries are evicted least recently used first when the cache is
+    closed
+    """
+    def __init__(self, filename: str, max_entries: int = 20000) -> None:
+        makedirs(path.dirname(filename), exist_ok=True)
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(filename)
+        self.db.execute("CREATE TABLE IF NOT EXISTS renders (key TEXT PRIMARY KEY, "
+                        "front TEXT, back TEXT, media TEXT, used INTEGER)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS renders_used ON renders (used)")
+        # a counter rather than the clock orders the uses
+        self.used = self.db.execute("SELECT MAX(used) FROM renders").fetchone()[0] or 0
+        self.hits = 0
+        self.misses = 0
+
+    def _touch(self) -> int:
+        self.used += 1
+        return self.used
+
+    def get(self, key: str):
+        """
+        Returns (front, back, media) or None, media being the list of
+        (name, src) pairs the file handler returned for its images
+        """
+        row = self.db.execute("SELECT front, back, media FROM renders WHERE key = ?",
+                              (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE renders SET used = ? WHERE key = ?", (self._touch(), key))
+        return row[0], row[1], json.loads(row[2])
+
+    def put(self, key: str, front: str, back: str, media: list) -> None:
+        self.db.execute("INSERT OR REPLACE INTO renders VALUES (?, ?, ?, ?, ?)",
+                        (key, front, back, json.dumps(media), self._touch()))
+
+    def evict(self) -> None:
+        self.db.execute("DELETE FROM renders WHERE key IN (SELECT key FROM renders "
+                        "ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def close(self) -> None:
+        self.evict()
+        self.db.commit()
+        self.db.close()
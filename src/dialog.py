@@ -0,0 +1,92 @@
+from aqt import mw 
+from aqt.qt import * 
+from os import path
+from aqt.utils import tooltip
+from . import parser
+from . import handler
+from .manifest import Manifest
+from .cache import RenderCache
+from .minted import MintedMemo
+
+class ImportDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Import Dialog")
+        self.resize(400, 300)
+        self.setupUI()
+        self.setupConnections()
+        self.show()
+
+    def setupUI(self):
+        self.layout = QVBoxLayout(self)
+        self.label = QLabel("Import Dialog")
+        self.layout.addWidget(self.label)
+        # add a text field to set the base deck 
+        self.baseDeck = QLineEdit()
+        self.baseDeck.setPlaceholderText("Base Deck")
+        self.layout.addWidget(self.baseDeck)
+        # only render and update the blocks changed since the last import
+        self.incremental = QCheckBox("Skip unchanged blocks")
+        self.incremental.setChecked(True)
+        self.layout.addWidget(self.incremental)
+        # add a button to open the file selector dialog
+        self.button = QPushButton("Import")
+        self.layout.addWidget(self.button)
+
+    def setupConnections(self):
+        self.button.clicked.connect(self.onButtonClicked)
+
+    def onButtonClicked(self):
+        # open a file selector dialog that selects tex files
+        dialog = QFileDialog(self)
+        dialog.setFileMode(QFileDialog.ExistingFile)
+        dialog.setNameFilter("Tex files (*.tex)")
+        filename = ""
+        if dialog.exec_():
+            filename = dialog.selectedFiles()[0]
+            # close the dialog
+            self.close()
+        # read on every import, so config changes apply without a restart
+        config = mw.addonManager.getConfig(__package__) or {}
+        skipped = parser.cst_registry.reset(config.get("cst_environments") or {})
+        if skipped:
+            tooltip("cst_environments: skipped " + ", ".join(map(str, skipped))
+                    + ', each needs a "label"')
+        # get the filename's base url 
+        base_url = filename[:filename.rfind('/')]
+        # get the base deck name 
+        base_deck = self.baseDeck.text() 
+        ghd = handler.gen_gen_handler(base_deck)
+        fhd = handler.gen_file_handler(base_url)
+        manifest = None
+        if filename and self.incremental.isChecked():
+            manifest = Manifest.for_source(handler.user_files(), filename,
+                                           base_deck, parser.render_version)
+            # notes deleted in Anki since the last import are written again
+            manifest.retain(handler.existing_notes(manifest.note_ids()))
+        cache = None
+        if filename and config.get("render_cache_size", 0) > 0:
+            cache = RenderCache(path.join(handler.user_files(), "render_cache.sqlite3"),
+                                config["render_cache_size"])
+        minted_store = None
+        if filename and config.get("minted_memo_persist", False):
+            minted_store = RenderCache(path.join(handler.user_files(), "minted_cache.sqlite3"),
+                                       config.get("minted_memo_size", 2000))
+        minted = MintedMemo(config.get("minted_memo_size", 2000), minted_store)
+        # parse the file 
+        try:
+            if filename:
+                with parser.open_source(filename, parser.include_resolver) as source:
+                    parser.parse_all(source, ghd, fhd, manifest, cache,
+                                     config.get("render_workers", 0), minted)
+        finally:
+            if cache is not None:
+                cache.close()
+            if minted_store is not None:
+                minted_store.close()
+        if manifest is not None:
+            manifest.save()
+        if minted.hits + minted.misses > 0:
+            tooltip(f"minted memo: {minted.hits} hits, {minted.misses} misses")
+        mw.reset()
+        self.accept()
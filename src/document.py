@@ -0,0 +1,81 @@
+################ Document IR ################
+
+# The nodes only hold offsets into one shared source string, the text is
+# sliced when a block is rendered. The source may also be utf-8 bytes, e.g. a
+# memory-mapped file, in which case only the slices are decoded
+
+def decode(text) -> str:
+    return text if isinstance(text, str) else bytes(text).decode("utf-8")
+
+class Span:
+    """A [start, end) range of the source"""
+    __slots__ = ("source", "start", "end")
+
+    def __init__(self, source: str, start: int, end: int) -> None:
+        self.source = source
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"Span({self.start}, {self.end})"
+
+    def __len__(self):
+        return self.end - self.start
+
+    def text(self) -> str:
+        return decode(self.source[self.start:self.end])
+
+class Block:
+    """
+    A cst block: \\begin{cst<kind>}{<title>}<front>\\end{cst<kind>}<back>
+    where back runs until the next block or section
+    """
+    __slots__ = ("source", "kind", "title", "front", "back", "start")
+
+    def __init__(self, source: str, match, end: int) -> None:
+        self.source = source
+        self.kind = decode(match.group(1))
+        self.title = None if match.start(2) < 0 else Span(source, *match.span(2))
+        self.front = Span(source, *match.span(3))
+        self.back = Span(source, match.end(), end)
+        self.start = match.start()
+
+    def __repr__(self):
+        return f"Block({self.kind}, {self.start}, {self.back.end})"
+
+    def raw(self) -> str:
+        """The source of the whole block, including its back"""
+        return decode(self.source[self.start:self.back.end])
+
+class Section:
+    """
+    A sectioning unit with its deck path and the blocks before the next
+    heading, e.g. before its first subsection
+    """
+    __slots__ = ("path", "blocks")
+
+    def __init__(self, path: str, blocks: list) -> None:
+        self.path = path
+        self.blocks = blocks
+
+    def __repr__(self):
+        return f"Section({self.path!r}, {len(self.blocks)} blocks)"
+
+class Card:
+    """
+    A rendered card, unpacking as (deck path, front, back). note_id is the
+    note to update, and the consumer sets it to the note it wrote
+    """
+    __slots__ = ("deck", "front", "back", "note_id")
+
+    def __init__(self, deck: str, front: str, back: str, note_id=None) -> None:
+        self.deck = deck
+        self.front = front
+        self.back = back
+        self.note_id = note_id
+
+    def __repr__(self):
+        return f"Card({self.deck!r}, {self.front!r}, {self.back!r})"
+
+    def __iter__(self):
+        return iter((self.deck, self.front, self.back))
@@ -1,17 +1,35 @@
 from os import path
 from aqt import mw 
+from anki.errors import NotFoundError
 
 def gen_handler(name: str):
-    deck_id = mw.col.decks.id(name)
-    card_model = mw.col.models.byName("Basic")
-    mw.col.decks.select(deck_id)
-    mw.col.models.setCurrent(card_model)
-    def handler(front: str, back: str):
+    deck = {}
+    def resolve():
+        # only create and select the deck once a card is written to it
+        if not deck:
+            deck["id"] = mw.col.decks.id(name)
+            card_model = mw.col.models.byName("Basic")
+            mw.col.decks.select(deck["id"])
+            mw.col.models.setCurrent(card_model)
+        return deck["id"]
+    def handler(front: str, back: str, note_id=None):
+        deck_id = resolve()
+        if note_id is not None:
+            try:
+                note = mw.col.get_note(note_id)
+            except NotFoundError:
+                note = None
+            if note is not None:
+                note['Front'] = front
+                note['Back'] = back
+                mw.col.update_note(note)
+                return note.id
         note = mw.col.newNote()
         note['Front'] = front
         note['Back'] = back 
         mw.col.add_note(note, deck_id=deck_id)
         mw.col.flush()
+        return note.id
     return handler
 
 def gen_gen_handler(base_deck: str):
@@ -27,3 +45,13 @@ def gen_file_handler(base_path: str):
         p = path.join(base_path, name)
         return mw.col.media.addFile(p)
     return file_handler
+
+def existing_notes(note_ids: set) -> set:
+    """The ids in note_ids whose note still exists, in one search"""
+    if not note_ids:
+        return set()
+    return set(mw.col.find_notes("nid:" + ",".join(map(str, sorted(note_ids)))))
+
+def user_files() -> str:
+    """The user_files folder of the add-on, kept across add-on updates"""
+    return path.join(path.dirname(__file__), "user_files")
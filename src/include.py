@@ -0,0 +1,266 @@
+from bisect import bisect_right
+from hashlib import sha1
+from mmap import mmap, ACCESS_READ
+from os import path, stat
+from re import compile
+
+# \input{file} and \include{file}, scanned over the utf-8 bytes of a file
+include_regex = compile(rb"\\(?:input|include)\{([^{}]*)\}")
+# a % that starts a comment, i.e. not escaped as \%
+_comment_regex = compile(rb"(?<!\\)(?:\\\\)*%")
+
+def commented(data: bytes, pos: int) -> bool:
+    """Whether data[pos] is in a comment, after a % on its line"""
+    start = data.rfind(b"\n", 0, pos) + 1
+    return _comment_regex.search(data, start, pos) is not None
+
+def map_file(filename: str):
+    """The bytes of a file, memory-mapped, or b"" for an empty file"""
+    with open(filename, "rb") as f:
+        try:
+            return mmap(f.fileno(), 0, access=ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            return b""
+
+class SplitMatch:
+    """
+    A regex match kept as offsets, like the matches of re for the parser.
+    Only the groups in texts are kept as decoded text, e.g. a heading title
+    """
+    __slots__ = ("spans", "texts")
+
+    def __init__(self, spans: tuple, texts: dict) -> None:
+        self.spans = spans
+        self.texts = texts
+
+    @classmethod
+    def of(cls, match, groups: tuple = ()):
+        spans = tuple(match.span(group) for group in range(match.re.groups + 1))
+        return cls(spans, {group: bytes(match.group(group)).decode("utf-8")
+                                for group in groups if match.start(group) >= 0})
+
+    def __repr__(self):
+        return f"SplitMatch({self.start()}, {self.end()})"
+
+    def start(self, group: int = 0) -> int:
+        return self.spans[group][0]
+
+    def end(self, group: int = 0) -> int:
+        return self.spans[group][1]
+
+    def span(self, group: int = 0) -> tuple:
+        return self.spans[group]
+
+    def group(self, group: int = 0) -> str:
+        return self.texts.get(group)
+
+    def moved(self, offset) -> "SplitMatch":
+        """The match with its offsets passed through offset"""
+        return SplitMatch(tuple((-1, -1) if start < 0 else (offset(start), offset(end))
+                                for start, end in self.spans), self.texts)
+
+class TexFile:
+    """
+    The offsets of one .tex file, split at its \\input and \\include
+    commands. key is the (mtime, size) the file was read with. The bytes are
+    not kept: splits holds what the parser found in them, by a key naming
+    the split, and digests the sha1 of the (start, end) slices hashed so far
+    """
+    __slots__ = ("filename", "key", "size", "includes", "splits", "digests")
+
+    def __init__(self, filename: str, key: tuple, data: bytes) -> None:
+        self.filename = filename
+        self.key = key
+        self.size = len(data)
+        # (start, end, included name) of the commands, the commented out
+        # ones are left out like LaTeX does
+        self.includes = [(match.start(), match.end(), match.group(1).decode("utf-8").strip())
+                         for match in include_regex.finditer(data)
+                         if not commented(data, match.start())]
+        self.splits = {}
+        self.digests = {}
+
+class ExpandedSource:
+    """
+    A main file with its includes expanded in place, as utf-8 bytes for
+    iter_document and parse_all. The files are not joined: a slice reads
+    the pieces it covers from the files, which are memory-mapped when first
+    read and closed by close. Offsets are those of the expanded text
+    """
+    def __init__(self, fragments: list, instances: list, length: int) -> None:
+        # (offset, TexFile, start, end): the file's [start, end) is at offset
+        self.fragments = fragments
+        self.offsets = [fragment[0] for fragment in fragments]
+        # (TexFile, function moving its offsets here), once per inclusion
+        self.instances = instances
+        self.length = length
+        # filename -> mapped bytes
+        self.maps = {}
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key: slice) -> bytes:
+        start, end, _ = key.indices(self.length)
+        return b"".join(self.data(file)[a:b] for file, a, b in self._pieces(start, end))
+
+    def split(self, key, split_file) -> list:
+        """
+        The matches split_file(data) finds in the bytes of each file, moved
+        here and ordered by offset. They are kept in the files under key, so
+        the files that did not change are not read again
+        """
+        matches = []
+        for file, offset in self.instances:
+            found = file.splits.get(key)
+            if found is None:
+                found = file.splits[key] = split_file(self.data(file))
+            matches.extend(match.moved(offset) for match in found)
+        matches.sort(key=SplitMatch.start)
+        return matches
+
+    def digest(self, start: int, end: int) -> str:
+        """
+        The sha1 of self[start:end], by the sha1 of its piece of each file.
+        The pieces hashed before are not read again
+        """
+        digests = []
+        for file, a, b in self._pieces(start, end):
+            piece = file.digests.get((a, b))
+            if piece is None:
+                piece = file.digests[(a, b)] = sha1(self.data(file)[a:b]).hexdigest()
+            digests.append(piece)
+        if len(digests) == 1:
+            return digests[0]
+        return sha1("".join(digests).encode("ascii")).hexdigest()
+
+    def data(self, file: TexFile):
+        data = self.maps.get(file.filename)
+        if data is None:
+            data = self.maps[file.filename] = map_file(file.filename)
+        return data
+
+    def close(self) -> None:
+        for data in self.maps.values():
+            if isinstance(data, mmap):
+                data.close()
+        self.maps = {}
+
+    def _pieces(self, start: int, end: int):
+        """(TexFile, start, end) of the pieces of self[start:end]"""
+        i = max(bisect_right(self.offsets, start) - 1, 0)
+        while i < len(self.fragments) and start < end:
+            offset, file, a, b = self.fragments[i]
+            if offset + b - a > start:
+                piece_end = min(end, offset + b - a)
+                yield file, a + start - offset, a + piece_end - offset
+                start = piece_end
+            i += 1
+
+class IncludeResolver:
+    """
+    Expands the \\input and \\include commands of a main file recursively,
+    resolving the names relative to the directory of the main file like
+    LaTeX does. Files are split once and cached by path, mtime and size,
+    without their bytes, so a re-import only reads the files that changed
+    """
+    def __init__(self) -> None:
+        # absolute path -> TexFile
+        self.files = {}
+        # absolute path -> (key, directory, absolute paths of the files it
+        # includes), one per include and None for a missing file
+        self.graph = {}
+
+    def load(self, filename: str) -> TexFile:
+        filename = path.abspath(filename)
+        status = stat(filename)
+        key = (status.st_mtime_ns, status.st_size)
+        file = self.files.get(filename)
+        if file is None or file.key != key:
+            data = map_file(filename)
+            try:
+                file = TexFile(filename, key, data)
+            finally:
+                if isinstance(data, mmap):
+                    data.close()
+            self.files[filename] = file
+        return file
+
+    def locate(self, directory: str, name: str):
+        """The file an include refers to, trying name.tex first, or None"""
+        candidate = path.join(directory, name)
+        for filename in (candidate + ".tex", candidate):
+            if path.isfile(filename):
+                return path.abspath(filename)
+        return None
+
+    def children(self, file: TexFile, directory: str) -> list:
+        """
+        The files of the includes of file, as located the last time if file
+        did not change. Missing files are looked for again
+        """
+        entry = self.graph.get(file.filename)
+        if entry is None or entry[:2] != (file.key, directory):
+            entry = (file.key, directory, [None] * len(file.includes))
+            self.graph[file.filename] = entry
+        children = entry[2]
+        for i, (_, _, name) in enumerate(file.includes):
+            if children[i] is None:
+                children[i] = self.locate(directory, name)
+        return children
+
+    def dependencies(self, filename: str) -> set:
+        """The files filename includes, directly or not, as last resolved"""
+        seen = set()
+        pending = [path.abspath(filename)]
+        while pending:
+            entry = self.graph.get(pending.pop())
+            for child in [] if entry is None else entry[2]:
+                if child is not None and child not in seen:
+                    seen.add(child)
+                    pending.append(child)
+        return seen
+
+    def resolve(self, filename: str) -> ExpandedSource:
+        """The main file with its includes expanded"""
+        filename = path.abspath(filename)
+        fragments, instances = [], []
+        length = self._expand(self.load(filename), path.dirname(filename),
+                              fragments, instances, [], 0)
+        return ExpandedSource(fragments, instances, length)
+
+    def _expand(self, file: TexFile, directory: str, fragments: list,
+                instances: list, stack: list, pos: int) -> int:
+        """
+        Adds the fragments of file, expanded at offset pos, and returns the
+        offset after them
+        """
+        stack.append(file.filename)
+        children = self.children(file, directory)
+        # (end of an expanded include, shift of the offsets after it)
+        shifts = [(0, pos)]
+        start = 0
+        for i, (include_start, include_end, name) in enumerate(file.includes):
+            # missing files and cycles leave the command as text
+            if children[i] is None or children[i] in stack:
+                continue
+            try:
+                child = self.load(children[i])
+            except FileNotFoundError:
+                # removed since it was located
+                children[i] = None
+                continue
+            if include_start > start:
+                fragments.append((pos, file, start, include_start))
+                pos += include_start - start
+            pos = self._expand(child, directory, fragments, instances, stack, pos)
+            start = include_end
+            shifts.append((include_end, pos - include_end))
+        if file.size > start:
+            fragments.append((pos, file, start, file.size))
+            pos += file.size - start
+        ends = [end for end, _ in shifts]
+        instances.append((file, lambda offset: offset + shifts[bisect_right(ends, offset) - 1][1]))
+        stack.pop()
+        return pos
@@ -0,0 +1,237 @@
+from re import compile, escape as escape_regex
+from hashlib import sha1
+
+# the heads of the definitions harvested from a preamble
+definition_regex = compile(r"\\(?:(?:new|renew|provide)command\*?|(DeclareMathOperator)(\*?)|(def))(?![A-Za-z])")
+_name_regex = compile(r"\\([A-Za-z]+|.)")
+_parameters_regex = compile(r"(?:#[1-9])*")
+_number_regex = compile(r"\[\s*([1-9])\s*\]")
+_argument_regex = compile(r"#([1-9#])")
+
+def skip_spaces(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    return pos
+
+def read_group(text: str, pos: int, opening: str = "{", closing: str = "}"):
+    """
+    Reads the group starting at text[pos], e.g. {a {b}} or [a={b]}], in one
+    forward scan, balancing the braces inside it. Returns (content, end),
+    or None if there is no closed group
+    """
+    if pos >= len(text) or text[pos] != opening:
+        return None
+    depth = 0
+    i = pos + 1
+    while i < len(text):
+        c = text[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == closing and depth == 0:
+            return text[pos + 1:i], i + 1
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+        i += 1
+    return None
+
+def read_token(text: str, pos: int):
+    """Reads one undelimited argument: a group, a command or a character"""
+    pos = skip_spaces(text, pos)
+    if pos >= len(text):
+        return None
+    if text[pos] == "{":
+        return read_group(text, pos)
+    match = _name_regex.match(text, pos)
+    if match is not None:
+        return match.group(), match.end()
+    return text[pos], pos + 1
+
+class Macro:
+    """A macro with nargs arguments, the first optional if default is set"""
+    __slots__ = ("name", "nargs", "default", "body")
+
+    def __init__(self, name: str, nargs: int, default, body: str) -> None:
+        self.name = name
+        self.nargs = nargs
+        self.default = default
+        self.body = body
+
+    def read_arguments(self, text: str, pos: int):
+        """Returns (arguments, end), or None if the text ends before them"""
+        arguments = []
+        if self.default is not None:
+            group = read_group(text, skip_spaces(text, pos), "[", "]")
+            if group is None:
+                arguments.append(self.default)
+            else:
+                arguments.append(group[0])
+                pos = group[1]
+        while len(arguments) < self.nargs:
+            token = read_token(text, pos)
+            if token is None:
+                return None
+            arguments.append(token[0])
+            pos = token[1]
+        return arguments, pos
+
+    def substitute(self, arguments: list) -> str:
+        def argument(match) -> str:
+            if match.group(1) == "#":
+                return "#"
+            i = int(match.group(1)) - 1
+            return arguments[i] if i < len(arguments) else match.group()
+        return _argument_regex.sub(argument, self.body)
+
+class MacroTable:
+    """
+    The \\newcommand, \\renewcommand, \\providecommand, \\DeclareMathOperator
+    and \\def macros of a document, compiled into one regex. expand replaces
+    the invocations in a single scan, expanding the replacement again for
+    nested macros. Expansions are memoized per invocation, and limited by a
+    nesting depth and a budget of expansions per invocation in the text, so
+    a recursive macro stays unexpanded instead of running away
+    """
+    def __init__(self, macros: dict = None, depth: int = 32, budget: int = 10000) -> None:
+        self.macros = {}
+        self.depth = depth
+        self.budget = budget
+        self.memo = {}
+        self.regex = None
+        # identifies the definitions, e.g. to invalidate rendered blocks
+        self.signature = ""
+        self._left = budget
+        self._exhausted = False
+        for macro in (macros or {}).values():
+            self.macros[macro.name] = macro
+        self.compile()
+
+    @classmethod
+    def harvest(cls, text: str, **kwargs):
+        """The macros defined in text, e.g. the preamble of a document"""
+        macros = {}
+        pos = 0
+        while True:
+            match = definition_regex.search(text, pos)
+            if match is None:
+                break
+            pos = match.end()
+            macro = _read_definition(text, match)
+            if macro is not None:
+                macro, pos = macro
+                if not (match.group().startswith("\\provide") and macro.name in macros):
+                    macros[macro.name] = macro
+        return cls(macros, **kwargs)
+
+    def compile(self) -> None:
+        self.memo = {}
+        if not self.macros:
+            self.regex = None
+            self.signature = ""
+            return
+        names = sorted(self.macros, key=len, reverse=True)
+        alternatives = [escape_regex(name) + ("(?![A-Za-z])" if name.isalpha() else "")
+                        for name in names]
+        # minted is verbatim, and \\ is an escaped backslash, not a command
+        self.regex = compile(r"(?P<verbatim>\\begin\{minted\*?\}[\s\S]*?\\end\{minted\*?\})"
+                             r"|\\\\|\\(?P<name>" + "|".join(alternatives) + ")")
+        definitions = "\0".join(f"{m.name}\0{m.nargs}\0{m.default}\0{m.body}"
+                                for m in sorted(self.macros.values(), key=lambda m: m.name))
+        self.signature = sha1(definitions.encode("utf-8")).hexdigest()
+
+    def __len__(self):
+        return len(self.macros)
+
+    def expand(self, text: str) -> str:
+        if self.regex is None:
+            return text
+        return self._expand(text, 0)
+
+    def _expand(self, text: str, depth: int) -> str:
+        out = []
+        pos = 0
+        while True:
+            match = self.regex.search(text, pos)
+            if match is None:
+                break
+            if match.lastgroup != "name":
+                out.append(text[pos:match.end()])
+                pos = match.end()
+                continue
+            macro = self.macros[match.group("name")]
+            read = macro.read_arguments(text, match.end())
+            if read is None:
+                out.append(text[pos:match.end()])
+                pos = match.end()
+                continue
+            arguments, end = read
+            out.append(text[pos:match.start()])
+            out.append(self._invoke(text[match.start():end], macro, arguments, depth))
+            pos = end
+        out.append(text[pos:])
+        return "".join(out)
+
+    def _invoke(self, invocation: str, macro: Macro, arguments: list, depth: int) -> str:
+        expanded = self.memo.get(invocation)
+        if expanded is not None:
+            return expanded
+        if depth == 0:
+            self._left = self.budget
+        elif depth >= self.depth or self._left <= 0:
+            self._exhausted = True
+            return invocation
+        self._left -= 1
+        exhausted, self._exhausted = self._exhausted, False
+        expanded = self._expand(macro.substitute(arguments), depth + 1)
+        if depth == 0 and self._exhausted:
+            # a runaway expansion leaves the invocation as it is written,
+            # which does not depend on the budget left so it is kept
+            expanded = invocation
+            self._exhausted = False
+        # a cut off nested expansion depends on the budget left, so it is not
+        # kept
+        if not self._exhausted:
+            self.memo[invocation] = expanded
+        self._exhausted = exhausted or self._exhausted
+        return expanded
+
+def _read_definition(text: str, match):
+    """The Macro of the definition whose head is match, and its end"""
+    pos = skip_spaces(text, match.end())
+    group = read_group(text, pos)
+    if group is not None:
+        name_match = _name_regex.fullmatch(group[0].strip())
+        pos = group[1]
+    else:
+        name_match = _name_regex.match(text, pos)
+        pos = name_match.end() if name_match is not None else pos
+    if name_match is None:
+        return None
+    name = name_match.group(1)
+    nargs, default = 0, None
+    if match.group(1) is not None:
+        # \DeclareMathOperator{\name}{text}
+        body = read_group(text, skip_spaces(text, pos))
+        if body is None:
+            return None
+        operator = "\\operatorname" + match.group(2) + "{" + body[0] + "}"
+        return Macro(name, 0, None, operator), body[1]
+    if match.group(3) is not None:
+        # \def\name#1#2{body}, delimited parameters are not supported
+        parameters = _parameters_regex.match(text, pos)
+        nargs = len(parameters.group()) // 2
+        pos = parameters.end()
+    else:
+        number = _number_regex.match(text, skip_spaces(text, pos))
+        if number is not None:
+            nargs = int(number.group(1))
+            pos = number.end()
+            optional = read_group(text, skip_spaces(text, pos), "[", "]")
+            if optional is not None:
+                default, pos = optional
+    body = read_group(text, skip_spaces(text, pos))
+    if body is None:
+        return None
+    return Macro(name, nargs, default, body[0]), body[1]
@@ -0,0 +1,85 @@
+import json
+from hashlib import sha1
+from os import path, makedirs
+
+def digest(text: str) -> str:
+    return sha1(text.encode("utf-8")).hexdigest()
+
+class Manifest:
+    """
+    Content hashes and note ids of the cst blocks of one imported source,
+    keyed by section path and position, so that a re-import only renders
+    and touches the blocks that changed
+    """
+    def __init__(self, filename: str, version) -> None:
+        self.filename = filename
+        self.version = version
+        self.old = {}
+        self.new = {}
+        # a different renderer version re-renders every block in place
+        self.stale = False
+        if path.exists(filename):
+            with open(filename, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.old = data.get("sections", {})
+            self.stale = data.get("version") != version
+
+    @classmethod
+    def for_source(cls, directory: str, source: str, base_deck: str, version):
+        name = digest(path.abspath(source) + "\0" + base_deck)
+        return cls(path.join(directory, "manifests", name + ".json"), version)
+
+    def note_ids(self) -> set:
+        """The ids of the notes of the last import"""
+        return {note for entries in self.old.values() for _, note in entries
+                if note is not None}
+
+    def retain(self, existing: set) -> None:
+        """
+        Forgets the notes that are not in existing, e.g. deleted in Anki,
+        so their blocks are written again instead of skipped
+        """
+        for entries in self.old.values():
+            for entry in entries:
+                if entry[1] not in existing:
+                    entry[1] = None
+
+    def plan(self, section: str, digests: list) -> list:
+        """
+        Returns one (note id, changed) pair per block of the section. Blocks
+        with the same hash at the same position, or moved within the
+        section, keep their note unchanged if it still exists. Changed
+        blocks reuse the notes left over in order, and get None once there
+        are none left
+        """
+        old = self.old.get(section, [])
+        plan = [None] * len(digests)
+        claimed = [False] * len(old)
+        if not self.stale:
+            for i, d in enumerate(digests):
+                if i < len(old) and old[i][0] == d and old[i][1] is not None:
+                    plan[i] = (old[i][1], False)
+                    claimed[i] = True
+            moved = {}
+            for j, (d, note) in enumerate(old):
+                if not claimed[j] and note is not None:
+                    moved.setdefault(d, []).append(j)
+            for i, d in enumerate(digests):
+                if plan[i] is None and moved.get(d):
+                    j = moved[d].pop(0)
+                    plan[i] = (old[j][1], False)
+                    claimed[j] = True
+        free = iter([note for j, (_, note) in enumerate(old)
+                     if not claimed[j] and note is not None])
+        for i in range(len(plan)):
+            if plan[i] is None:
+                plan[i] = (next(free, None), True)
+        return plan
+
+    def record(self, section: str, digests: list, notes: list) -> None:
+        self.new[section] = [[d, note] for d, note in zip(digests, notes)]
+
+    def save(self) -> None:
+        makedirs(path.dirname(self.filename), exist_ok=True)
+        with open(self.filename, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "sections": self.new}, f)
@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from hashlib import sha1
+from html import escape
+
+################ Minted Highlighting ################
+
+# pygments is imported when the first snippet is highlighted, it ships with
+# Anki but the parser also works without it
+
+def _formatter_class():
+    import pygments.formatters
+
+    class HtmlCodeFormatter(pygments.formatters.HtmlFormatter):
+        """
+        The formatter of markdown2's fenced code blocks, so the html is the
+        same as when minted went through markdown2
+        """
+        def _wrap_code(self, inner):
+            yield 0, "<code>"
+            yield from inner
+            yield 0, "</code>"
+
+        def _add_newline(self, inner):
+            yield 0, "\n"
+            yield from inner
+            yield 0, "\n"
+
+        def wrap(self, source, outfile=None):
+            if outfile is None:
+                # pygments >= 2.12
+                return self._add_newline(self._wrap_pre(self._wrap_code(source)))
+            return self._wrap_div(self._add_newline(self._wrap_pre(self._wrap_code(source))))
+
+    return HtmlCodeFormatter
+
+def plain_html(language: str, code: str) -> str:
+    """A snippet without highlighting, escaped in a <pre> like markdown2 did"""
+    return "<pre><code>" + escape(code.strip("\n"), quote=False) + "\n</code></pre>\n"
+
+class Highlighter:
+    """
+    Highlights minted snippets with pygments directly, keeping one lexer per
+    language and a single formatter across all snippets
+    """
+    def __init__(self, cssclass: str = "codehilite", fallback=plain_html) -> None:
+        """
+        fallback renders the (language, code) snippets whose language has
+        no lexer, or all of them when pygments is missing
+        """
+        self.cssclass = cssclass
+        self.fallback = fallback
+        # part of the memo keys, the html depends on them
+        self.settings = f"cssclass={cssclass}"
+        # language -> lexer, or None if pygments does not know it
+        self.lexers = {}
+        self.formatter = None
+        self._highlight = None
+
+    def lexer(self, language: str):
+        if language in self.lexers:
+            return self.lexers[language]
+        lexer = None
+        try:
+            from pygments import highlight, lexers, util
+            self._highlight = highlight
+            try:
+                lexer = lexers.get_lexer_by_name(language)
+            except util.ClassNotFound:
+                pass
+        except ImportError:
+            pass
+        self.lexers[language] = lexer
+        return lexer
+
+    def highlight(self, language: str, code: str, memo=None) -> str:
+        """
+        The html of the snippet. Snippets in the MintedMemo memo are not
+        highlighted again, and the others are added to it
+        """
+        key = (language, code, self.settings)
+        html = None if memo is None else memo.get(key)
+        if html is None:
+            html = self._render(language, code)
+            if memo is not None:
+                memo.put(key, html)
+        return html
+
+    def prefetch(self, snippets: list, memo) -> None:
+        """
+        Highlights the distinct (language, code) snippets of a section at
+        once, grouped by language so each lexer runs over its snippets in a
+        row, into the MintedMemo memo. Snippets the memo already knows are
+        not highlighted again, and at most memo.size snippets are taken so
+        they do not evict each other before they are looked up
+        """
+        distinct = list(dict.fromkeys(snippets))[:memo.size]
+        for language, code in sorted(distinct, key=lambda snippet: snippet[0]):
+            key = (language, code, self.settings)
+            if memo.peek(key) is None:
+                memo.prefetch(key, self._render(language, code))
+
+    def _render(self, language: str, code: str) -> str:
+        lexer = self.lexer(language)
+        if lexer is None:
+            return self.fallback(language, code)
+        return self._highlight(code, lexer, self._formatter())
+
+    def _formatter(self):
+        if self.formatter is None:
+            self.formatter = _formatter_class()(cssclass=self.cssclass)
+        return self.formatter
+
+class MintedMemo:
+    """
+    Bounded LRU memo of the html of highlighted snippets, keyed by
+    (language, code, settings). store optionally persists it, e.g. a
+    RenderCache. hits and misses count the lookups, to size it
+    """
+    def __init__(self, size: int = 2000, store=None) -> None:
+        self.size = size
+        self.store = store
+        self.entries = OrderedDict()
+        # keys of entries put by Highlighter.prefetch and not looked up yet,
+        # their first lookup is a miss like it would be without the prefetch
+        self.fresh = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple):
+        html = self.entries.get(key)
+        if html is not None:
+            self.entries.move_to_end(key)
+            if key in self.fresh:
+                self.fresh.discard(key)
+                self.misses += 1
+            else:
+                self.hits += 1
+            return html
+        if self.store is not None:
+            hit = self.store.get(self._store_key(key))
+            if hit is not None:
+                self._remember(key, hit[0])
+                self.hits += 1
+                return hit[0]
+        self.misses += 1
+        return None
+
+    def peek(self, key: tuple):
+        """The html of key if known, without counting or reordering"""
+        html = self.entries.get(key)
+        if html is None and self.store is not None:
+            hit = self.store.get(self._store_key(key))
+            html = None if hit is None else hit[0]
+        return html
+
+    def put(self, key: tuple, html: str) -> None:
+        self._remember(key, html)
+        if self.store is not None:
+            self.store.put(self._store_key(key), html, "", [])
+
+    def prefetch(self, key: tuple, html: str) -> None:
+        """Puts a snippet highlighted before it is looked up"""
+        self.put(key, html)
+        self.fresh.add(key)
+
+    def _remember(self, key: tuple, html: str) -> None:
+        self.entries[key] = html
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            evicted, _ = self.entries.popitem(last=False)
+            self.fresh.discard(evicted)
+
+    @staticmethod
+    def _store_key(key: tuple) -> str:
+        return sha1("\0".join(key).encode("utf-8")).hexdigest()
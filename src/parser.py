@@ -1,10 +1,101 @@
-from re import Pattern, compile
-from . import markdown2
+import sys
+from bisect import bisect_left
+from hashlib import sha1
+from re import Pattern, compile, escape as escape_regex, UNICODE
+from mmap import mmap, ACCESS_READ
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from .manifest import digest
+from .document import Section, Block, Card, decode
+from .include import ExpandedSource, IncludeResolver, SplitMatch
+from .macros import MacroTable
+from .minted import Highlighter, MintedMemo
+
+# bump whenever the rendered html of a block changes
+render_version = 4
 
 ################ Utils ################
 
+class RenderContext:
+    """Per call state of a parse, e.g. the file handler of one import"""
+    def __init__(self, file_handler=None, manifest=None, cache=None,
+                 macros: MacroTable = None, pool=None) -> None:
+        self.file_handler = file_handler
+        self.manifest = manifest
+        self.cache = cache
+        self.macros = macros
+        # executor rendering the blocks in other processes, if any
+        self.pool = pool
+        # MintedMemo of the highlighted minted snippets
+        self.minted = None
+        # (name, src) of the images handed to the file handler, when recorded
+        self.media = None
+        # name -> src of the images resolved during this context
+        self.resolved = {}
+
+    def resolve(self, name: str) -> str:
+        """The file handler's src for an image, asking it once per name"""
+        src = self.resolved.get(name)
+        if src is None:
+            src = self.resolved[name] = self.file_handler(name)
+        return src
+
+def contextual(assembler):
+    """Mark an assembler as taking the render context as second argument"""
+    assembler.contextual = True
+    return assembler
+
+def _assemble_with(assembler, match, context):
+    if getattr(assembler, "contextual", False):
+        return assembler(match, context)
+    return assembler(match)
+
+def balanced_pattern(depth: int = 3) -> str:
+    """
+    Pattern of a text whose braces are balanced, up to depth levels of
+    nesting. The alternatives never overlap, so it matches in linear time
+    """
+    pattern = r"[^{}]*"
+    for _ in range(depth):
+        pattern = r"(?:[^{}]|\{" + pattern + r"\})*"
+    return pattern
+
+# an optional [key=value, ...] argument, capturing its content; the brackets
+# stop at the first "]" that is not inside braces
+optional_argument_pattern = (r"(?:\[((?:[^\[\]{}]|\{" + balanced_pattern()
+                             + r"\})*)\])?")
+
+def parse_options(text) -> dict:
+    """
+    The options of an optional argument, e.g. "width=0.5\\textwidth, frame"
+    gives {"width": "0.5\\textwidth", "frame": True}
+    """
+    options = {}
+    if not text:
+        return options
+    parts = []
+    depth, start = 0, 0
+    for i, c in enumerate(text):
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    for part in parts:
+        key, eq, value = part.partition("=")
+        key, value = key.strip(), value.strip()
+        if value.startswith("{") and value.endswith("}"):
+            value = value[1:-1]
+        if key:
+            options[key] = value if eq else True
+    return options
+
 class Parser: 
-    def parse(self, text: str) -> str:
+    def parse(self, text: str, context: RenderContext = None) -> str:
         return text
 
 class Pair:
@@ -22,6 +113,44 @@ class Pair:
     def transform_second(self, f):
         return Pair(self.first, f(self.second))
 
+_non_blank_regex = compile(r"\S")
+
+_bytes_regexes = {}
+
+def scanner(regex: Pattern, text) -> Pattern:
+    """
+    regex itself for a str text, or its bytes version for a bytes-like text,
+    e.g. a memory-mapped file. The patterns are ascii, so the offsets of a
+    match never split a utf-8 character
+    """
+    if isinstance(text, str):
+        return regex
+    compiled = _bytes_regexes.get(regex)
+    if compiled is None:
+        compiled = compile(regex.pattern.encode("utf-8"), regex.flags & ~UNICODE)
+        _bytes_regexes[regex] = compiled
+    return compiled
+
+def split_spans(text: str, regex: Pattern, start: int = 0, end: int = None):
+    """
+    Split text[start:end] by regex in one forward pass
+    It yields (match, start, end) tuples, with text[start:end] being the text
+    after the match and before the next match. The text before the first
+    match is yielded with a None match if it is not blank
+    """
+    end = len(text) if end is None else end
+    regex = scanner(regex, text)
+    non_blank_regex = scanner(_non_blank_regex, text)
+    prev = None
+    pos = start
+    for match in regex.finditer(text, start, end):
+        if prev is not None or non_blank_regex.search(text, start, match.start()):
+            yield (prev, pos, match.start())
+        prev = match
+        pos = match.end()
+    if prev is not None or non_blank_regex.search(text, pos, end):
+        yield (prev, pos, end)
+
 def split_regex(text: str, regex: Pattern) -> list: 
     """
     Split text by regex
@@ -29,42 +158,8 @@ def split_regex(text: str, regex: Pattern) -> list:
     object and the second one being the string after the match and before the 
     next match
     """
-    # find all matches 
-    matches = regex.finditer(text)
-    res = []
-    # reverse the matches 
-    for match in reversed(list(matches)):
-        tmp = text.split(match.group())
-        text = tmp[0] 
-        res.append(Pair(match, tmp[1]))
-    if (text.strip() != ""):
-        res.append(Pair(None, text))
-    # reverse the result 
-    return list(reversed(res))
-
-lmap = lambda f, *iterables: list(map(f, *iterables))
-
-################ Section Parser ################
-
-def _split_core(text: str, regex: Pattern) -> list: 
-    def f(s):
-        if (s is None):
-            return None 
-        else: 
-            return s.group(1)
-    return lmap(lambda p: p.transform_first(f), split_regex(text, regex))
-
-def split_sections(text: str) -> list: 
-    regex = compile(r"\\section(?:\*)?\{(.*?)\}")
-    return _split_core(text, regex)
-
-def split_subsections(text: str) -> list: 
-    regex = compile(r"\\subsection(?:\*)?\{(.*?)\}") 
-    return _split_core(text, regex)
-
-def split_subsubsections(text: str) -> list: 
-    regex = compile(r"\\subsubsection(?:\*)?\{(.*?)\}") 
-    return _split_core(text, regex)
+    return [Pair(match, text[start:end])
+            for match, start, end in split_spans(text, regex)]
 
 ################ Environment Parser ################ 
 
@@ -79,49 +174,194 @@ class ProtectedEnvironmentParser(NestedParser):
         begin: regex for the begin of the environment 
         end: regex for the end of the environment 
         imp: intermediate parser
+        The matches of one call are kept in locals of parse, so the parser
+        can be shared and called again while it parses
         """
         super().__init__(imp)
         self.regex = regex 
         self.assembler = assembler 
         self.imp = imp
-        self.tmp = []
+        self.prefix = f"__{hash(self)}_"
+        self.placeholder_regex = compile(f"__{hash(self)}_(\\d+)__")
+
+    def parse(self, text: str, context: RenderContext = None) -> str:
+        matches = []
+        def protect(match) -> str:
+            # record the match and replace it with a placeholder
+            matches.append(match)
+            return f"{self.prefix}{len(matches) - 1}__"
+        def restore(placeholder) -> str:
+            match = matches[int(placeholder.group(1))]
+            return _assemble_with(self.assembler, match, context)
+        # begin([\s\S]*?)end 
+        text = self.regex.sub(protect, text)
+        text = self.imp.parse(text, context)
+        if not matches:
+            return text
+        return self.placeholder_regex.sub(restore, text)
+
+class _GroupView:
+    """Groups of one alternative inside a combined match"""
+    __slots__ = ("match", "base")
+
+    def __init__(self, match, base: int) -> None:
+        self.match = match
+        self.base = base
+
+    def group(self, i: int = 0) -> str:
+        return self.match.group(self.base + i)
+
+class _Hole:
+    """Match stand-in whose groups are all a marker"""
+    marker = "\0"
+
+    def group(self, i: int = 0) -> str:
+        return self.marker
+
+def _split_assembler(assembler) -> tuple:
+    """
+    Split the output of an assembler into the html emitted before and after
+    the body of the environment
+    """
+    return tuple(assembler(_Hole()).split(_Hole.marker, 1))
 
-    def parse(self, text: str) -> str:
-        self.tmp = []
-        text = self._parse(text) 
-        text = self.imp.parse(text)
-        text = self._assemble(text)
-        return text
+class _Emitter:
+    """
+    Output buffer that emits environments and commands as literal text and
+    patches them with their html once their closing token is seen, so the
+    unclosed ones stay literal
+    """
+    __slots__ = ("out", "html", "opened", "stack")
+
+    def __init__(self, html: dict) -> None:
+        self.out = []
+        self.html = html
+        # environment name -> index in out of its begin
+        self.opened = {}
+        # (command name, index in out of the command)
+        self.stack = []
+
+    def _patch(self, name: str, i: int) -> None:
+        start, end = self.html[name]
+        self.out[i] = start
+        self.out.append(end)
+
+    def begin(self, name: str, token: str) -> None:
+        # like the lazy regex, the first begin pairs with the next end
+        if name not in self.opened:
+            self.opened[name] = len(self.out)
+        self.out.append(token)
+
+    def end(self, name: str, token: str) -> None:
+        if name in self.opened:
+            self._patch(name, self.opened.pop(name))
+        else:
+            self.out.append(token)
 
-    def _parse(self, text: str) -> str:
-        """
-        begin([\\s\\S]*?)end 
-        """
-        self.tmp = list(self.regex.finditer(text))
-        count = 0
-        for match in self.tmp:
-            # replace the match with a placeholder 
-            text = text.replace(match.group(),
-                                f"__{hash(self)}_{count}__")
-            count += 1
-        return text
+    def command(self, name: str, token: str) -> None:
+        self.stack.append((name, len(self.out)))
+        self.out.append(token)
 
-    def _assemble(self, text: str) -> str: 
-        for i, match in enumerate(self.tmp):
-            text = text.replace(f"__{hash(self)}_{i}__", self.assembler(match))
-        return text
+    def open(self, token: str) -> None:
+        # a plain group, so the "}" closing it does not close a command
+        self.stack.append((None, len(self.out)))
+        self.out.append(token)
 
-class UnprotectedEnvironmentParser(Parser):
-    def __init__(self, regex: Pattern, assembler) -> None:
-        super().__init__()
-        self.regex = regex 
-        self.assembler = assembler
+    def close(self, token: str) -> None:
+        # a "}" closes the innermost open command or group
+        if self.stack and self.stack[-1][0] is not None:
+            self._patch(*self.stack.pop())
+            return
+        if self.stack:
+            self.stack.pop()
+        self.out.append(token)
 
-    def parse(self, text: str) -> str: 
-        matches = list(self.regex.finditer(text)) 
-        for match in matches: 
-            text = text.replace(match.group(), self.assembler(match)) 
-        return text
+    def getvalue(self) -> str:
+        return "".join(self.out)
+
+_regex_metacharacters = frozenset(".^$*+?{}[]\\|()")
+
+def leading_char(pattern: str):
+    """
+    The character every match of pattern starts with, if it starts with a
+    literal, e.g. "\\" for \\\\color, or None. Patterns with a "|" are
+    not looked into
+    """
+    if "|" in pattern:
+        return None
+    if pattern[:1] == "\\" and pattern[1:2] and not pattern[1].isalnum():
+        char, rest = pattern[1], pattern[2:]
+    elif pattern[:1] and pattern[0] not in _regex_metacharacters:
+        char, rest = pattern[0], pattern[1:]
+    else:
+        return None
+    # a quantified character may be left out
+    return None if rest[:1] in ("*", "?", "{") else char
+
+def guarded_alternation(alternatives: list, leading: set) -> Pattern:
+    """
+    The alternation of alternatives, behind a lookahead on the characters
+    they start with. re tries every alternative at every position, the
+    lookahead skips the positions where none can match in one test
+    """
+    pattern = "|".join(alternatives)
+    if None in leading:
+        return compile(pattern)
+    guard = "".join(sorted(escape_regex(c) for c in leading))
+    return compile(f"(?=[{guard}])(?:{pattern})")
+
+class CombinedEnvironmentParser(Parser):
+    def __init__(self, environments: dict, commands: dict, patterns: dict) -> None:
+        """
+        environments: name -> (begin, end, assembler), literal delimiters
+        commands: name -> (command, assembler), closed by the matching "}"
+        patterns: name -> (regex, assembler), replaced as a whole
+        All of them are compiled into one alternation and applied by span in
+        a single scan, dispatching on the name of the matched group. The
+        braces are balanced with a stack, so the arguments of the commands
+        may nest, e.g. \\textbf{a {b} \\textit{c}}
+        """
+        super().__init__()
+        self.html = {}
+        self.dispatch = {}
+        self.alternatives = []
+        # the first character of every alternative
+        self.leading = {"\\", "{", "}"}
+        for name, (regex, assembler) in patterns.items():
+            self.alternatives.append(f"(?P<{name}>{regex.pattern})")
+            self.leading.add(leading_char(regex.pattern))
+            self.dispatch[name] = lambda e, m, a=assembler: e.out.append(
+                a(_GroupView(m, m.re.groupindex[m.lastgroup])))
+        for name, (begin, end, assembler) in environments.items():
+            self.html[name] = _split_assembler(assembler)
+            self.alternatives.append(f"(?P<{name}_begin>{escape_regex(begin)})")
+            self.alternatives.append(f"(?P<{name}_end>{escape_regex(end)})")
+            self.leading.update((begin[0], end[0]))
+            self.dispatch[name + "_begin"] = lambda e, m, n=name: e.begin(n, m.group())
+            self.dispatch[name + "_end"] = lambda e, m, n=name: e.end(n, m.group())
+        for name, (command, assembler) in commands.items():
+            self.html[name] = _split_assembler(assembler)
+            self.alternatives.append(f"(?P<{name}>{escape_regex(command)})")
+            self.leading.add(command[0])
+            self.dispatch[name] = lambda e, m, n=name: e.command(n, m.group())
+        # escaped braces are text and do not open or close a group
+        self.alternatives.append(r"(?P<brace>\\[\\{}])")
+        self.dispatch["brace"] = lambda e, m: e.out.append(m.group())
+        self.alternatives.append(r"(?P<open>\{)")
+        self.dispatch["open"] = lambda e, m: e.open(m.group())
+        self.alternatives.append(r"(?P<close>\})")
+        self.dispatch["close"] = lambda e, m: e.close(m.group())
+        self.regex = guarded_alternation(self.alternatives, self.leading)
+
+    def parse(self, text: str, context: RenderContext = None) -> str:
+        emitter = _Emitter(self.html)
+        pos = 0
+        for match in self.regex.finditer(text):
+            emitter.out.append(text[pos:match.start()])
+            pos = match.end()
+            self.dispatch[match.lastgroup](emitter, match)
+        emitter.out.append(text[pos:])
+        return emitter.getvalue()
 
 class SimpleReplacementParser(Parser): 
     def __init__(self, fstr: str, tstr: str) -> None:
@@ -129,30 +369,47 @@ class SimpleReplacementParser(Parser):
         self.fstr = fstr 
         self.tstr = tstr 
 
-    def parse(self, text: str) -> str: 
+    def parse(self, text: str, context: RenderContext = None) -> str: 
         return text.replace(self.fstr, self.tstr)
 
+class MultiReplacementParser(Parser):
+    def __init__(self, replacements: dict) -> None:
+        """
+        replacements: literal -> replacement
+        All literals are replaced in one scan, preferring the longest literal
+        at each position. Replacements are not scanned again
+        """
+        super().__init__()
+        self.replacements = replacements
+        literals = sorted(replacements, key=len, reverse=True)
+        self.regex = compile("|".join(map(escape_regex, literals)))
+
+    def _replace(self, match) -> str:
+        return self.replacements[match.group()]
+
+    def parse(self, text: str, context: RenderContext = None) -> str:
+        return self.regex.sub(self._replace, text)
+
 class SequentialParser(Parser):
     def __init__(self, parsers: list) -> None:
         super().__init__()
         self.parsers = parsers 
 
-    def parse(self, text: str) -> str:
+    def parse(self, text: str, context: RenderContext = None) -> str:
         for parser in self.parsers:
-            text = parser.parse(text)
+            text = parser.parse(text, context)
         return text
 
 ################ Parsers ################
 
 noop = Parser()
 
+_escape_html_parser = MultiReplacementParser({
+    "&": "&amp;", "<": "&lt;", ">": "&gt;", "{{": "{ {", "}}": "} }",
+})
+
 def escape(text: str) -> str:
-    text = text.replace("&", "&amp;")
-    text = text.replace("<", "&lt;")
-    text = text.replace(">", "&gt;")
-    text = text.replace("{{", "{ {")
-    text = text.replace("}}", "} }")
-    return text
+    return _escape_html_parser.parse(text)
 
 ################ Unprotected Parsers ################
 
@@ -160,80 +417,72 @@ parsers = []
 
 # escape
 
-_escape_parser_1 = SimpleReplacementParser("&", "&amp;")
-_escape_parser_2 = SimpleReplacementParser("<", "&lt;")
-_escape_parser_3 = SimpleReplacementParser(">", "&gt;")
-_escape_parser_4 = SimpleReplacementParser("`", "'")
-escape_parser = SequentialParser([_escape_parser_1, _escape_parser_2,
-                                  _escape_parser_3, _escape_parser_4])
-parsers.append(escape_parser)
+escape_replacements = {"&": "&amp;", "<": "&lt;", ">": "&gt;", "`": "'"}
 
 # line parser - replace \n\n with <br> and \n with " "
 
-line_parser = SimpleReplacementParser("\n\n", "<br>")
-line_parser = SequentialParser([line_parser, SimpleReplacementParser("\n", " ")])
-parsers.append(line_parser)
+line_replacements = {"\n\n": "<br>", "\n": " "}
 
 # center
 
-center_regex = compile(r"\\begin\{center\}([\s\S]*?)\\end\{center\}")
 center_assembler = lambda match: r'<div class="tex-center">' + match.group(1) + r"</div>"
-center_parser = UnprotectedEnvironmentParser(center_regex, center_assembler)
-parsers.append(center_parser)
 
 # proof
 
-proof_regex = compile(r"\\begin\{proof\}([\s\S]*?)\\end\{proof\}") 
 _proof_start = r'<div class="tex-proof"><span class="tex-proof-start">Proof.</span>'
 _proof_end = r'<div class="tex-proof-end"></div></div>'
 proof_assembler = lambda match: _proof_start + match.group(1) + r"</div>" + _proof_end
-proof_parser = UnprotectedEnvironmentParser(proof_regex, proof_assembler)
-parsers.append(proof_parser)
 
-# styles 
+# styles, the argument is scanned with balanced braces
 
-bold_regex = compile(r"\\textbf\{([\s\S]*?)\}") 
 bold_assembler = lambda match: f'<span class="tex-bold">{match.group(1)}</span>'
-bold_parser = UnprotectedEnvironmentParser(bold_regex, bold_assembler)
-
-italic_regex = compile(r"\\textit\{([\s\S]*?)\}") 
 italic_assembler = lambda match: f'<span class="tex-italic">{match.group(1)}</span>'
-italic_parser = UnprotectedEnvironmentParser(italic_regex, italic_assembler) 
-
-underline_regex = compile(r"\\underline\{([\s\S]*?)\}") 
 underline_assembler = lambda match: f'<span class="tex-underline">{match.group(1)}</span>'
-underline_parser = UnprotectedEnvironmentParser(underline_regex, underline_assembler)
-
-code_regex = compile(r"\\texttt\{([\s\S]*?)\}")
 code_assembler = lambda match: f'<span class="tex-code">{match.group(1)}</span>'
-code_parser = UnprotectedEnvironmentParser(code_regex, code_assembler)
 
 color_regex = compile(r"\\color\{([\s\s]*?)\}")
 color_assembler = lambda _: ""
-color_parser = UnprotectedEnvironmentParser(color_regex, color_assembler)
-
-parsers += [bold_parser, italic_parser, underline_parser, code_parser, color_parser]
 
 # lists
 
-itemize_regex = compile(r"\\begin\{itemize\}([\s\S]*?)\\end\{itemize\}")
 itemize_assembler = lambda match: r'<ul class="tex-itemize"><li style="display:none;">' + match.group(1) + r"</li></ul>"
-itemize_parser = UnprotectedEnvironmentParser(itemize_regex, itemize_assembler)
-enumerate_regex = compile(r"\\begin\{enumerate\}([\s\S]*?)\\end\{enumerate\}")
 enumerate_assembler = lambda match: r'<ol class="tex-enumerate"><li style="display:none;">' + match.group(1) + r"</li></ol>"
-enumerate_parser = UnprotectedEnvironmentParser(enumerate_regex, enumerate_assembler)
-item_parser = SimpleReplacementParser(r"\item", r"</li><li>")
-parsers += [itemize_parser, enumerate_parser, item_parser]
+item_replacements = {r"\item": r"</li><li>"}
 
-# paragraph parser 
+# paragraph
 
-paragraph_regex = compile(r"\\paragraph\{(.+?)\}")
 paragraph_assembler = lambda match: '<span class="tex-paragraph">' + match.group(1) + "</span>"
-paragraph_parser = UnprotectedEnvironmentParser(paragraph_regex, paragraph_assembler)
-parsers.append(paragraph_parser)
 
-pagebreak_parser = SimpleReplacementParser(r"\pagebreak", r"")
-parsers.append(pagebreak_parser)
+# environments, styles and paragraphs in one scan
+
+environment_parser = CombinedEnvironmentParser(
+    environments={
+        "center": (r"\begin{center}", r"\end{center}", center_assembler),
+        "proof": (r"\begin{proof}", r"\end{proof}", proof_assembler),
+        "itemize": (r"\begin{itemize}", r"\end{itemize}", itemize_assembler),
+        "enumerate": (r"\begin{enumerate}", r"\end{enumerate}", enumerate_assembler),
+    },
+    commands={
+        "bold": (r"\textbf{", bold_assembler),
+        "italic": (r"\textit{", italic_assembler),
+        "underline": (r"\underline{", underline_assembler),
+        "code": (r"\texttt{", code_assembler),
+        "paragraph": (r"\paragraph{", paragraph_assembler),
+    },
+    patterns={
+        "color": (color_regex, color_assembler),
+    },
+)
+
+pagebreak_replacements = {r"\pagebreak": r""}
+
+# all literals in one scan, before the environments
+
+literal_parser = MultiReplacementParser({
+    **escape_replacements, **line_replacements,
+    **item_replacements, **pagebreak_replacements,
+})
+parsers += [literal_parser, environment_parser]
 
 # sequential aggregate 
 
@@ -252,8 +501,9 @@ display_math_regex = compile(r"\$\$([\s\S]*?)\$\$")
 display_math_parser = ProtectedEnvironmentParser(display_math_regex, 
                                                  block_math_assembler, inline_math_parser)
 
+dollar_sign_regex = compile(r"\\\$")
 dollar_sign_assembler = lambda _: r"\$"
-dollar_sign_parser = ProtectedEnvironmentParser(compile(r"\\\$"),
+dollar_sign_parser = ProtectedEnvironmentParser(dollar_sign_regex,
                                                 dollar_sign_assembler, display_math_parser)
 
 equation_regex = compile(r"\\begin\{equation\*?\}([\s\S]*?)\\end\{equation\*?\}")
@@ -269,109 +519,509 @@ align_regex = compile(r"\\begin\{align\*?\}([\s\S]*?)\\end\{align\*?\}")
 align_assembler = lambda match: r"\[\begin{aligned}" + escape(match.group(1)) + r"\end{aligned}\]"
 align_parser = ProtectedEnvironmentParser(align_regex, align_assembler, gather_parser)
 
-minted_regex = compile(r"\\begin\{minted\*?\}(?:\[[\s\S]*\])?\{([\s\S]*?)\}([\s\S]*?)\\end\{minted\*?\}")
-code_md_assembler = lambda match: r"```" + match.group(1) + "\n" + escape(match.group(2)) + r"```"
-minted_assembler = lambda match: markdown2.markdown(code_md_assembler(match), extras=["fenced-code-blocks"])
+# groups: options, language, code
+minted_regex = compile(r"\\begin\{minted\*?\}" + optional_argument_pattern
+                       + r"\{([\s\S]*?)\}([\s\S]*?)\\end\{minted\*?\}")
+
+highlighter = Highlighter()
+# like escape, keep anki from reading cloze deletions in the code
+_cloze_parser = MultiReplacementParser({"{{": "{ {", "}}": "} }"})
+
+@contextual
+def minted_assembler(match, context: RenderContext = None) -> str:
+    memo = None if context is None else context.minted
+    return highlighter.highlight(match.group(2), _cloze_parser.parse(match.group(3)),
+                                 memo)
+
 minted_parser = ProtectedEnvironmentParser(minted_regex, minted_assembler, align_parser)
 
-image_regex = compile(r"\\includegraphics(?:\[[\s\S]*\])?\{([\s\S]*?)\}")
-image_assembler = lambda match: r"![](" + match.group(1) + ")"
+# groups: options, file name
+image_regex = compile(r"\\includegraphics" + optional_argument_pattern
+                      + r"\{([\s\S]*?)\}")
+
+_relative_length_regex = compile(r"([\d.]*)\s*\\(?:textwidth|linewidth|columnwidth)")
+_absolute_length_regex = compile(r"([\d.]+)\s*(pt|px|cm|mm|in|em|ex)")
+
+def css_length(length: str):
+    """A LaTeX length in css, e.g. 0.5\\textwidth as 50%, or None"""
+    match = _relative_length_regex.fullmatch(length)
+    if match is not None:
+        return f"{float(match.group(1) or 1) * 100:g}%"
+    match = _absolute_length_regex.fullmatch(length)
+    if match is not None:
+        return match.group(1) + match.group(2)
+    return None
+
+@contextual
+def image_assembler(match, context: RenderContext = None) -> str:
+    if context is None or context.file_handler is None:
+        return r"![](" + match.group(2) + ")"
+    src = context.resolve(match.group(2))
+    if context.media is not None:
+        context.media.append((match.group(2), src))
+    style = ""
+    for key, value in parse_options(match.group(1)).items():
+        length = css_length(value) if key in ("width", "height") else None
+        if length is not None:
+            style += f"{key}: {length}; "
+    if style:
+        return r'<img src="' + src + r'" style="' + style.rstrip() + r'" />'
+    return r'<img src="' + src + r'" />'
+
 image_parser = ProtectedEnvironmentParser(image_regex, image_assembler, minted_parser)
 
-# parser 
+# parser
 parser = image_parser
 
 ################# Custom Section Parser #################
 
-def split_cst(text: str, handler, file_handler): 
-    cst_regex = compile(r"\\begin\{cst(.*?)\}(?:\{([\s\S]*?)\})?([\s\S]*?)\\end\{cst(.*?)\}")
-    splits = split_regex(text, cst_regex)
-    for split in splits: 
-        handle_split(split, handler, file_handler)
+class CstEnvironment:
+    """A cst environment, e.g. \\begin{cstdef}{title} for a definition"""
+    def __init__(self, label: str, css_class: str, starred: bool) -> None:
+        self.label = label
+        self.css_class = css_class
+        self.starred = starred
+
+    def representation(self, title) -> str:
+        span = f'<span class="tex-cst tex-cst-{self.css_class}">'
+        if self.starred or title is None:
+            return span + self.label + r".</span>"
+        return span + self.label + " " + title + r".</span>"
 
-def handle_split(split, handler, file_handler):
-    first = split.first
-    split_type = first.group(1)
+class CstRegistry:
+    """
+    Maps the suffix of the cst environments, e.g. "def" or "def*", to their
+    CstEnvironment. The cst regex only matches registered environments
+    """
+    def __init__(self, environments: dict) -> None:
+        self.environments = {}
+        self.regex = None
+        self.update(environments)
+
+    def register(self, name: str, label: str, css_class: str = None,
+                 starred: bool = True) -> None:
+        css_class = css_class or name
+        self.environments[name] = CstEnvironment(label, css_class, False)
+        if starred:
+            self.environments[name + "*"] = CstEnvironment(label, css_class, True)
+        self.regex = self._compile()
+
+    def update(self, environments: dict) -> list:
+        """
+        environments: name -> {"label": ..., "class": ..., "starred": ...}, 
+        the format of the "cst_environments" add-on config. Returns the names 
+        of the entries that were skipped because they are malformed
+        """
+        skipped = []
+        for name, entry in environments.items():
+            if (not isinstance(entry, dict) or not isinstance(entry.get("label"), str)
+                    or not isinstance(entry.get("class") or "", str)):
+                skipped.append(name)
+                continue
+            self.register(name, entry["label"], entry.get("class"),
+                          entry.get("starred", True))
+        return skipped
+
+    def reset(self, environments: dict) -> list:
+        """
+        Registers the default environments plus environments, dropping the 
+        ones registered by an earlier config
+        """
+        self.environments = {}
+        self.update(default_environments)
+        return self.update(environments)
+
+    def get(self, split_type: str):
+        return self.environments.get(split_type)
+
+    def _compile(self) -> Pattern:
+        names = sorted(self.environments, key=len, reverse=True)
+        # the title may hold braces, e.g. {Limit of $x^{2}$}
+        return compile(r"\\begin\{cst(" + "|".join(map(escape_regex, names))
+                       + r")\}(?:\{(" + balanced_pattern()
+                       + r")\})?([\s\S]*?)\\end\{cst(.*?)\}")
+
+default_environments = {
+    "def": {"label": "Definition"},
+    "thm": {"label": "Theorem"},
+    "eg": {"label": "Example"},
+    "exe": {"label": "Exercise"},
+    "eexe": {"label": "Extra Exercise"},
+    "rmk": {"label": "Remark"},
+    "qsn": {"label": "Question"},
+    "cor": {"label": "Corollary"},
+}
+
+cst_registry = CstRegistry(default_environments)
+
+def build_blocks(source: str, start: int = 0, end: int = None) -> list:
+    """
+    The cst blocks of source[start:end]. The text before the first block is
+    not part of any card
+    """
+    return [Block(source, match, e)
+            for match, _, e in split_spans(source, cst_registry.regex, start, end)
+            if match is not None]
+
+def iter_block_cards(blocks: list, path: str, context: RenderContext):
+    """
+    Yields the cards of the blocks of one section. With a manifest, only the
+    blocks that changed since the last import are rendered and yielded, and
+    the note ids set on the cards are recorded once the section is consumed
+    """
+    digests, planned = _plan_section(blocks, path, context)
+    if context.minted is not None:
+        prefetch_minted([block for block, _, changed in planned if changed],
+                        context.minted)
+    render = lambda block, note_id: render_card(block, path, context, note_id)
+    yield from _iter_planned(path, digests, planned, render, context)
+
+def prefetch_minted(blocks: list, memo: MintedMemo) -> None:
+    """
+    Highlights the minted snippets of the fronts and backs of blocks at once,
+    grouped by language, into memo for minted_assembler. Only the snippets
+    are decoded
+    """
+    snippets = []
+    for block in blocks:
+        for span in (block.front, block.back):
+            text = span.source[span.start:span.end]
+            snippets.extend((decode(match.group(2)), _cloze_parser.parse(decode(match.group(3))))
+                            for match in scanner(minted_regex, text).finditer(text))
+    highlighter.prefetch(snippets, memo)
+
+def raw_digest(block: Block) -> str:
+    """
+    The sha1 of the source of the whole block. An ExpandedSource hashes it
+    by file, so the blocks of the files that did not change are not read
+    """
+    source, start, end = block.source, block.start, block.back.end
+    if isinstance(source, ExpandedSource):
+        return source.digest(start, end)
+    data = source[start:end]
+    return sha1(data.encode("utf-8") if isinstance(data, str) else data).hexdigest()
+
+def _plan_section(blocks: list, path: str, context: RenderContext) -> tuple:
+    """
+    (digests, [(block, note id, changed)]) of a section, the digests being
+    None without a manifest
+    """
+    manifest = context.manifest
+    if manifest is None:
+        return None, [(block, None, True) for block in blocks]
+    # blocks are rendered again when the macros they may use change
+    salt = "" if context.macros is None else context.macros.signature
+    digests = [digest(salt + raw_digest(block)) for block in blocks]
+    planned = [(block, note_id, changed) for block, (note_id, changed)
+               in zip(blocks, manifest.plan(path, digests))]
+    return digests, planned
+
+def _iter_planned(path: str, digests, planned: list, render, context: RenderContext):
+    notes = []
+    for block, note_id, changed in planned:
+        if changed:
+            card = render(block, note_id)
+            yield card
+            note_id = card.note_id
+        notes.append(note_id)
+    if digests is not None:
+        context.manifest.record(path, digests, notes)
+
+def _submit_section(blocks: list, path: str, context: RenderContext):
+    """
+    iter_block_cards, but the changed blocks are all sent to the pool of the
+    context before the first card is waited for
+    """
+    digests, planned = _plan_section(blocks, path, context)
+    pending = {block.start: start_card(block, path, context)
+               for block, _, changed in planned if changed}
+    render = lambda block, note_id: pending[block.start](note_id)
+    return _iter_planned(path, digests, planned, render, context)
+
+def write_card(handler, card: Card):
+    """Hands a card to the handler, passing the id of the note to update"""
+    if card.note_id is None:
+        return handler(card.front, card.back)
+    return handler(card.front, card.back, card.note_id)
+
+_image_placeholder_regex = compile("\0([^\0]*)\0")
+
+def _image_placeholder(name: str) -> str:
+    return "\0" + name + "\0"
+
+def render_remote(front: str, back: str) -> tuple:
+    """
+    Renders a block in a worker process. Images are left as placeholders
+    for the file handler of the main process
+    """
+    context = RenderContext(_image_placeholder)
+    return parser.parse(front, context), parser.parse(back, context)
+
+def _stop_pool(context: RenderContext) -> None:
+    """Renders the rest of the import in this process"""
+    if context.pool is not None:
+        context.pool.shutdown(wait=False, cancel_futures=True)
+        context.pool = None
+
+def submit_block(front: str, back: str, context: RenderContext):
+    """
+    Starts rendering the front and back of a cst block, through the render
+    cache, and returns a function waiting for them. With a pool in the
+    context, the block is rendered in a worker process
+    """
+    cache = context.cache
+    key = None
+    if cache is not None:
+        key = digest("\0".join([str(render_version), front, back]))
+        hit = cache.get(key)
+        # the images must still be added, and resolve to the same media names.
+        # On a mismatch the names resolved here are reused by the render
+        if hit is not None and all(context.resolve(name) == src
+                                   for name, src in hit[2]):
+            return lambda: (hit[0], hit[1])
+    if context.pool is not None:
+        try:
+            future = context.pool.submit(render_remote, front, back)
+        except Exception:
+            # the workers could not be started, or the pool is broken
+            _stop_pool(context)
+            future = None
+        def wait() -> tuple:
+            media = []
+            def resolve(match) -> str:
+                src = context.resolve(match.group(1))
+                media.append((match.group(1), src))
+                return src
+            rendered = None
+            if future is not None:
+                try:
+                    rendered = future.result()
+                except Exception:
+                    # e.g. BrokenProcessPool when a worker died or could not
+                    # import the add-on. A genuine render error is raised
+                    # again by the render below
+                    _stop_pool(context)
+            if rendered is None:
+                rendered = render_remote(front, back)
+            front_html, back_html = (_image_placeholder_regex.sub(resolve, html)
+                                     for html in rendered)
+            if cache is not None:
+                cache.put(key, front_html, back_html, media)
+            return front_html, back_html
+        return wait
+    if cache is None:
+        rendered = parser.parse(front, context), parser.parse(back, context)
+        return lambda: rendered
+    context.media = []
+    try:
+        front, back = parser.parse(front, context), parser.parse(back, context)
+        cache.put(key, front, back, context.media)
+    finally:
+        context.media = None
+    return lambda: (front, back)
+
+def start_card(block: Block, path: str, context: RenderContext):
+    """
+    Starts rendering the card of a block, and returns a function of the note
+    id waiting for the Card
+    """
+    expand = (lambda text: text) if context.macros is None else context.macros.expand
+    environment = cst_registry.get(block.kind)
     representationStr = ""
-    if split_type == "def":
-        representationStr = r'<span class="tex-cst tex-cst-def">Definition ' + first.group(2) + r".</span>"
-    elif split_type == "def*":
-        representationStr = r'<span class="tex-cst tex-cst-def">Definition.</span>'
-    elif split_type == "thm":
-        representationStr = r'<span class="tex-cst tex-cst-thm">Theorem ' + first.group(2) + r".</span>"
-    elif split_type == "thm*":
-        representationStr = r'<span class="tex-cst tex-cst-thm">Theorem.</span>'
-    elif split_type == "eg":
-        representationStr = r'<span class="tex-cst tex-cst-eg">Example ' + first.group(2) + r".</span>"
-    elif split_type == "eg*":
-        representationStr = r'<span class="tex-cst tex-cst-eg">Example.</span>'
-    elif split_type == "exe":
-        representationStr = r'<span class="tex-cst tex-cst-exe">Exercise ' + first.group(2) + r".</span>"
-    elif split_type == "exe*":
-        representationStr = r'<span class="tex-cst tex-cst-exe">Exercise.</span>'
-    elif split_type == "eexe":
-        representationStr = r'<span class="tex-cst tex-cst-eexe">Extra Exercise ' + first.group(2) + r".</span>"
-    elif split_type == "eexe*":
-        representationStr = r'<span class="tex-cst tex-cst-eexe">Extra Exercise.</span>'
-    elif split_type == "rmk":
-        representationStr = r'<span class="tex-cst tex-cst-rmk">Remark ' + first.group(2) + r".</span>"
-    elif split_type == "rmk*":
-        representationStr = r'<span class="tex-cst tex-cst-rmk">Remark.</span>'
-    elif split_type == "qsn":
-        representationStr = r'<span class="tex-cst tex-cst-qsn">Question ' + first.group(2) + r".</span>"
-    elif split_type == "qsn*":
-        representationStr = r'<span class="tex-cst tex-cst-qsn">Question.</span>'
-    elif split_type == "cor":
-        representationStr = r'<span class="tex-cst tex-cst-cor">Corollary ' + first.group(2) + r".</span>"
-    elif split_type == "cor*":
-        representationStr = r'<span class="tex-cst tex-cst-cor">Corollary.</span>'
-    else:
-        representationStr = ""
-    image_regex = compile(r"\\includegraphics(?:\[[\s\S]*\])?\{([\s\S]*?)\}")
-    image_assembler = lambda match: r'<img src="' + file_handler(match.group(1)) + r'" />'
-    _parser = ProtectedEnvironmentParser(image_regex, image_assembler, minted_parser)
-    front_text = representationStr + _parser.parse(first.group(3))
-    back_text = _parser.parse(split.second)
-    handler(front_text, back_text)
+    if environment is not None:
+        title = None if block.title is None else expand(block.title.text())
+        representationStr = environment.representation(title)
+    wait = submit_block(expand(block.front.text()), expand(block.back.text()),
+                        context)
+    def card(note_id=None) -> Card:
+        front_text, back_text = wait()
+        return Card(path, representationStr + front_text, back_text, note_id)
+    return card
+
+def render_card(block: Block, path: str, context: RenderContext,
+                note_id=None) -> Card:
+    return start_card(block, path, context)(note_id)
+
+def handle_split(block: Block, handler, context: RenderContext, note_id=None):
+    """
+    Renders one cst block and hands it to the handler, passing the id of the
+    note to update if any. Returns what the handler returns
+    """
+    return write_card(handler, render_card(block, "", context, note_id))
 
 ################ Parse All ################
 
-def parse_all(text: str, handler_gen, file_handler): 
-    sections = split_sections(text)
-    sections_counter = 1
-    for section in sections: 
-        name = ""
-        if section.first is None:
-            split_cst(section.second, handler_gen(name), file_handler)
-            continue
-        else:
-            name = str(sections_counter) + ". " + section.first 
-            sections_counter += 1
-        subsections = split_subsections(section.second)
-        subsections_counter = 1
-        for subsection in subsections: 
-            subname = ""
-            if subsection.first is None:
-                subname = name 
-                split_cst(subsection.second, handler_gen(subname), file_handler)
-                continue
-            else:
-                subname = name + "::" + str(subsections_counter) + ". " + subsection.first
-                subsections_counter += 1
-            subsubsections = split_subsubsections(subsection.second)
-            subsubsections_counter = 1
-            for subsubsection in subsubsections: 
-                subsubname = ""
-                if subsubsection.first is None:
-                    subsubname = subname 
-                    split_cst(subsubsection.second, handler_gen(subsubname),
-                              file_handler)
-                    continue
-                else: 
-                    subsubname = subname + "::" + str(subsubsections_counter) + ". " + subsubsection.first
-                    subsubsections_counter += 1
-                split_cst(subsubsection.second, handler_gen(subsubname),
-                          file_handler)
+# the sectioning commands, outermost first. A heading is a child of the
+# closest open heading of an outer level, so the levels may be skipped
+sectioning_levels = ["part", "chapter", "section", "subsection", "subsubsection"]
+sectioning_regex = compile(r"\\(" + "|".join(sectioning_levels) + r")\*?\{("
+                           + balanced_pattern() + r")\}")
+_sectioning_depth = {name: i for i, name in enumerate(sectioning_levels)}
+
+def iter_document(source):
+    """
+    Yields the sections of source in document order, each with its blocks,
+    in one pass over the headings. source is a str, a bytes-like utf-8
+    text or an ExpandedSource, e.g. from open_source
+    """
+    if isinstance(source, ExpandedSource):
+        headings = source.split("headings", _split_headings)
+        blocks_between = _included_blocks(source, headings)
+    else:
+        headings = scanner(sectioning_regex, source).finditer(source)
+        blocks_between = lambda start, end: build_blocks(source, start, end)
+    # [depth, deck path, number of children] of the open headings
+    stack = [[-1, "", 0]]
+    path, pos = "", 0
+    for match in headings:
+        yield Section(path, blocks_between(pos, match.start()))
+        depth = _sectioning_depth[decode(match.group(1))]
+        while stack[-1][0] >= depth:
+            stack.pop()
+        parent = stack[-1]
+        parent[2] += 1
+        path = f"{parent[2]}. {decode(match.group(2))}"
+        if parent[1] != "":
+            path = parent[1] + "::" + path
+        stack.append([depth, path, 0])
+        pos = match.end()
+    yield Section(path, blocks_between(pos, len(source)))
+
+################ Included Files ################
+
+# An ExpandedSource is split file by file, and the splits are cached with
+# the files, so only the files that changed are scanned again. A block is
+# matched within one file, between the headings of that file
+
+def _split_headings(data) -> list:
+    return [SplitMatch.of(match, (1, 2))
+            for match in scanner(sectioning_regex, data).finditer(data)]
+
+def _split_blocks(data) -> list:
+    regex = scanner(cst_registry.regex, data)
+    blocks, pos = [], 0
+    for heading in scanner(sectioning_regex, data).finditer(data):
+        blocks.extend(SplitMatch.of(match, (1,))
+                      for match in regex.finditer(data, pos, heading.start()))
+        pos = heading.end()
+    blocks.extend(SplitMatch.of(match, (1,)) for match in regex.finditer(data, pos))
+    return blocks
+
+def _split_document(data) -> list:
+    match = scanner(_document_regex, data).search(data)
+    return [] if match is None else [SplitMatch.of(match)]
+
+def _included_blocks(source: ExpandedSource, headings: list):
+    """
+    build_blocks for source, from the blocks of its files. A block with an
+    included heading in it, or in an earlier block, is dropped, like the
+    block would not match in the expanded text
+    """
+    starts = [heading.start() for heading in headings]
+    kept, end = [], 0
+    for match in source.split(("blocks", cst_registry.regex.pattern), _split_blocks):
+        i = bisect_left(starts, match.start())
+        if match.start() >= end and (i == len(starts) or starts[i] >= match.end()):
+            kept.append(match)
+            end = match.end()
+    kept_starts = [match.start() for match in kept]
+    def blocks_between(start: int, end: int) -> list:
+        i, j = bisect_left(kept_starts, start), bisect_left(kept_starts, end)
+        return [Block(source, kept[k], kept_starts[k + 1] if k + 1 < j else end)
+                for k in range(i, j)]
+    return blocks_between
+
+_document_regex = compile(r"\\begin\{document\}")
+
+def harvest_macros(source) -> MacroTable:
+    """
+    The macros of the preamble of source. A file without one, e.g. a
+    chapter, has none, so it is not decoded as a whole
+    """
+    if isinstance(source, ExpandedSource):
+        found = source.split("document", _split_document)
+        match = found[0] if found else None
+    else:
+        match = scanner(_document_regex, source).search(source)
+    if match is None:
+        return MacroTable()
+    return MacroTable.harvest(decode(source[:match.start()]))
+
+def iter_cards(text: str, context: RenderContext = None):
+    """
+    Yields the (deck path, front, back) Card of every cst block lazily,
+    section by section. The macros of the preamble are expanded in the
+    blocks, unless the context already has a macro table
+    """
+    context = RenderContext() if context is None else context
+    if context.macros is None:
+        context.macros = harvest_macros(text)
+    if context.minted is None:
+        context.minted = MintedMemo()
+    if context.pool is None:
+        for section in iter_document(text):
+            yield from iter_block_cards(section.blocks, section.path, context)
+        return
+    # the next section is sent to the pool while the cards of this one are
+    # consumed, and the cards keep the document order
+    previous = iter(())
+    for section in iter_document(text):
+        current = _submit_section(section.blocks, section.path, context)
+        yield from previous
+        previous = current
+    yield from previous
+
+# kept across imports, so a re-import only reads the files that changed
+include_resolver = IncludeResolver()
+
+@contextmanager
+def open_source(filename: str, resolver: IncludeResolver = None):
+    """
+    Memory-maps a utf-8 .tex file for iter_document and parse_all. Only the
+    slices of the blocks are decoded, when they are rendered. With a
+    resolver, a file that has \\input or \\include commands is expanded
+    with its included files instead, which are mapped as they are read
+    """
+    if resolver is not None and resolver.load(filename).includes:
+        source = resolver.resolve(filename)
+        try:
+            yield source
+        finally:
+            source.close()
+        return
+    with open(filename, "rb") as f:
+        try:
+            source = mmap(f.fileno(), 0, access=ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            yield b""
+            return
+        try:
+            yield source
+        finally:
+            source.close()
+
+def parse_all(text, handler_gen, file_handler, manifest=None, cache=None,
+              workers: int = 0, minted: MintedMemo = None): 
+    """
+    Renders and writes every card of text. With workers, the blocks are
+    rendered in that many processes, and the handlers still run here
+    """
+    pool = None
+    # a frozen Anki build cannot start python workers with its executable
+    if workers > 0 and not getattr(sys, "frozen", False):
+        pool = ProcessPoolExecutor(workers, mp_context=get_context("spawn"))
+    context = RenderContext(file_handler, manifest, cache, pool=pool)
+    context.minted = minted
+    try:
+        deck, handler = None, None
+        for card in iter_cards(text, context):
+            if card.deck != deck:
+                deck, handler = card.deck, handler_gen(card.deck)
+            card.note_id = write_card(handler, card)
+    finally:
+        if context.pool is not None:
+            context.pool.shutdown()
 
 
 ################ Tests ################
@@ -0,0 +1,11 @@
+import sys
+import types
+from os import path
+
+# the add-on's __init__ needs a running Anki, so src is imported as a
+# package without it
+src = path.join(path.dirname(path.dirname(path.abspath(__file__))), "src")
+if "tex_cardify" not in sys.modules:
+    package = types.ModuleType("tex_cardify")
+    package.__path__ = [src]
+    sys.modules["tex_cardify"] = package
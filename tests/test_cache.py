@@ -0,0 +1,57 @@
+from tex_cardify.cache import RenderCache
+
+def test_round_trip(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache.sqlite3"))
+    cache.put("k", "front", "back", [["a.png", "a-1.png"]])
+    assert cache.get("k") == ("front", "back", [["a.png", "a-1.png"]])
+    assert cache.get("missing") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+def test_entries_persist(tmp_path):
+    filename = str(tmp_path / "sub" / "cache.sqlite3")
+    cache = RenderCache(filename)
+    cache.put("k", "front", "back", [])
+    cache.close()
+    assert RenderCache(filename).get("k") == ("front", "back", [])
+
+def test_least_recently_used_are_evicted_on_close(tmp_path):
+    filename = str(tmp_path / "cache.sqlite3")
+    cache = RenderCache(filename, max_entries=2)
+    for key in "abc":
+        cache.put(key, key, key, [])
+    # reading a makes b the least recently used
+    cache.get("a")
+    cache.close()
+    cache = RenderCache(filename, max_entries=2)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+def import_cards(tmp_path, text: str, file_handler) -> list:
+    from tex_cardify import parser
+    cards = []
+    cache = RenderCache(str(tmp_path / "cache.sqlite3"))
+    parser.parse_all(text, lambda deck: lambda front, back: cards.append(back),
+                     file_handler, cache=cache)
+    cache.close()
+    return cards
+
+def test_images_are_resolved_once_per_import(tmp_path):
+    text = ("\\begin{cstdef}{a}x\\end{cstdef} \\includegraphics{a.png} \\includegraphics{a.png}\n"
+            "\\begin{cstdef}{b}y\\end{cstdef} \\includegraphics{a.png}\n")
+    calls = []
+    def file_handler(name: str) -> str:
+        calls.append(name)
+        return "media-" + name
+    first = import_cards(tmp_path, text, file_handler)
+    assert calls == ["a.png"]
+    # a cache hit checks the image once, and a changed media name renders
+    # again with the name it was checked with
+    calls.clear()
+    assert import_cards(tmp_path, text, file_handler) == first
+    assert calls == ["a.png"]
+    calls.clear()
+    renamed = import_cards(tmp_path, text, lambda name: calls.append(name) or "other-" + name)
+    assert calls == ["a.png"]
+    assert renamed == [card.replace("media-", "other-") for card in first]
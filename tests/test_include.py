@@ -0,0 +1,101 @@
+import os
+
+from tex_cardify import parser
+from tex_cardify.include import IncludeResolver, TexFile
+from tex_cardify.manifest import Manifest
+
+def write(path, text: str) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def test_includes_are_expanded_recursively(tmp_path):
+    main = write(tmp_path / "main.tex", "a \\input{ch/one} b \\include{ch/two.tex} c")
+    write(tmp_path / "ch" / "one.tex", "one \\input{ch/three}")
+    write(tmp_path / "ch" / "two.tex", "two")
+    write(tmp_path / "ch" / "three.tex", "three")
+    # like LaTeX, names are relative to the main file, not to the includer
+    assert IncludeResolver().resolve(main)[:] == b"a one three b two c"
+
+def test_missing_files_and_cycles_stay_as_text(tmp_path):
+    main = write(tmp_path / "main.tex", "\\input{missing} \\input{loop}")
+    write(tmp_path / "loop.tex", "loop \\input{main}")
+    assert IncludeResolver().resolve(main)[:] == b"\\input{missing} loop \\input{main}"
+
+def test_commented_out_includes_are_skipped():
+    data = (b"% \\input{a}\n\\input{b} % \\input{c}\n"
+            b"50\\% \\input{d}\n\\\\% \\input{e}\n")
+    assert [name for _, _, name in TexFile("f", (0, 0), data).includes] == ["b", "d"]
+
+def test_files_are_read_again_only_when_changed(tmp_path):
+    main = write(tmp_path / "main.tex", "\\input{one} \\input{two}")
+    one = write(tmp_path / "one.tex", "one")
+    two = write(tmp_path / "two.tex", "two")
+    resolver = IncludeResolver()
+    resolver.resolve(main)
+    cached = dict(resolver.files)
+    write(tmp_path / "two.tex", "two, edited")
+    os.utime(two, ns=(0, 0))
+    assert resolver.resolve(main)[:] == b"one two, edited"
+    assert resolver.files[os.path.abspath(one)] is cached[os.path.abspath(one)]
+    assert resolver.files[os.path.abspath(two)] is not cached[os.path.abspath(two)]
+
+def test_the_include_graph_is_kept(tmp_path):
+    main = write(tmp_path / "main.tex", "\\input{one} \\input{missing}")
+    one = write(tmp_path / "one.tex", "\\input{two}")
+    two = write(tmp_path / "two.tex", "two")
+    resolver = IncludeResolver()
+    resolver.resolve(main)
+    assert resolver.graph[os.path.abspath(main)][2] == [os.path.abspath(one), None]
+    assert resolver.dependencies(main) == {os.path.abspath(one), os.path.abspath(two)}
+    # a missing file is looked for again
+    write(tmp_path / "missing.tex", "found")
+    assert resolver.resolve(main)[:] == b"two found"
+
+def sections(source) -> list:
+    return [(section.path, [(block.kind, block.front.text(), block.back.text())
+                            for block in section.blocks])
+            for section in parser.iter_document(source)]
+
+def test_sections_match_the_expanded_text(tmp_path):
+    main = write(tmp_path / "main.tex", "\\begin{document}\n\\input{one}\n\\input{two}\n"
+                 "\\section{C}\\begin{cstdef}{c}\\input{front}\\end{cstdef}c\n")
+    write(tmp_path / "one.tex", "\\section{A}\n\\begin{cstthm}a\\end{cstthm}back\n"
+          "\\subsection{A1}\\begin{cstrmk*}a1\\end{cstrmk*}\n")
+    write(tmp_path / "two.tex", "\\begin{cstdef}{b}b\\end{cstdef}\n\\section{B}\n")
+    write(tmp_path / "front.tex", "in the front")
+    resolver = IncludeResolver()
+    with parser.open_source(main, resolver) as source:
+        expanded = sections(source)
+        text = source[:]
+    assert expanded == sections(text)
+    assert expanded[-1] == ("3. C", [("def", "in the front", "c\n")])
+    # the second import uses the splits kept with the files
+    with parser.open_source(main, resolver) as source:
+        assert sections(source) == expanded
+
+def test_unchanged_files_are_not_read(tmp_path):
+    main = write(tmp_path / "main.tex", "\\newcommand{\\R}{\\mathbb{R}}\n\\begin{document}\n"
+                 "\\input{one}\n\\input{two}\n")
+    write(tmp_path / "one.tex", "\\section{A}\\begin{cstdef}{a}$\\R$\\end{cstdef}a\n")
+    two = write(tmp_path / "two.tex", "\\section{B}\\begin{cstdef}{b}b\\end{cstdef}b\n")
+    resolver = IncludeResolver()
+    def import_cards() -> tuple:
+        manifest = Manifest(str(tmp_path / "manifest.json"), parser.render_version)
+        with parser.open_source(main, resolver) as source:
+            cards = []
+            context = parser.RenderContext(manifest=manifest)
+            for card in parser.iter_cards(source, context):
+                card.note_id = len(cards)
+                cards.append(card)
+            read = set(source.maps)
+        manifest.save()
+        return [card.front for card in cards], read
+    cards, _ = import_cards()
+    assert len(cards) == 2
+    write(tmp_path / "two.tex", "\\section{B}\\begin{cstdef}{b}b, edited\\end{cstdef}b\n")
+    os.utime(two, ns=(0, 0))
+    cards, read = import_cards()
+    assert cards == ['<span class="tex-cst tex-cst-def">Definition b.</span>b, edited']
+    # the preamble of the main file is read for its macros
+    assert read == {os.path.abspath(main), os.path.abspath(two)}
@@ -0,0 +1,43 @@
+from tex_cardify.macros import MacroTable
+
+def test_newcommand_with_arguments():
+    macros = MacroTable.harvest(r"\newcommand{\R}{\mathbb{R}}"
+                                r"\newcommand{\norm}[1]{\lVert #1 \rVert}"
+                                r"\renewcommand\pair[2]{(#1, #2)}")
+    assert macros.expand(r"$\norm{x} \in \R$ \pair a{b}") == r"$\lVert x \rVert \in \mathbb{R}$ (a, b)"
+
+def test_optional_argument():
+    macros = MacroTable.harvest(r"\newcommand{\seq}[2][n]{(#2_#1)}")
+    assert macros.expand(r"\seq{a} \seq[k]{b}") == r"(a_n) (b_k)"
+
+def test_def_and_declare_math_operator():
+    macros = MacroTable.harvest(r"\def\half#1{\frac{#1}{2}}\DeclareMathOperator{\rank}{rank}"
+                                r"\DeclareMathOperator*{\argmax}{arg\,max}")
+    assert macros.expand(r"\half{x} \rank A \argmax") == (
+        r"\frac{x}{2} \operatorname{rank} A \operatorname*{arg\,max}")
+
+def test_providecommand_keeps_the_first_definition():
+    macros = MacroTable.harvest(r"\newcommand{\x}{a}\providecommand{\x}{b}\providecommand{\y}{c}")
+    assert macros.expand(r"\x\y") == "ac"
+
+def test_nested_macros_and_prefixes():
+    macros = MacroTable.harvest(r"\newcommand{\R}{\mathbb{R}}\newcommand{\Rn}{\R^n}")
+    # \Rn is not \R followed by n, and \Real is no macro
+    assert macros.expand(r"\Rn \R \Real") == r"\mathbb{R}^n \mathbb{R} \Real"
+
+def test_minted_and_escaped_backslashes_are_left_alone():
+    macros = MacroTable.harvest(r"\newcommand{\R}{\mathbb{R}}")
+    text = "\\\\R \\begin{minted}{tex}\n\\R\n\\end{minted} \\R"
+    assert macros.expand(text) == "\\\\R \\begin{minted}{tex}\n\\R\n\\end{minted} \\mathbb{R}"
+
+def test_runaway_macros_stay_unexpanded():
+    macros = MacroTable.harvest(r"\newcommand\bad{\bad\bad}\newcommand\deep{x\deep}"
+                                r"\newcommand{\R}{\mathbb{R}}", budget=100)
+    assert macros.expand(r"\bad \R \deep \bad") == r"\bad \mathbb{R} \deep \bad"
+
+def test_signature_follows_the_definitions():
+    a = MacroTable.harvest(r"\newcommand{\R}{\mathbb{R}}")
+    b = MacroTable.harvest(r"\newcommand{\R}{\mathbf{R}}")
+    assert a.signature != b.signature
+    assert a.signature == MacroTable.harvest(r"\newcommand{\R}{\mathbb{R}}").signature
+    assert MacroTable().signature == ""
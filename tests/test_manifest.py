@@ -0,0 +1,47 @@
+from tex_cardify.manifest import Manifest, digest
+
+def manifest(tmp_path, sections: dict, version=1):
+    """A manifest whose last import recorded sections"""
+    old = Manifest(str(tmp_path / "manifest.json"), version)
+    for section, entries in sections.items():
+        old.record(section, [digest(text) for text, _ in entries],
+                   [note for _, note in entries])
+    old.save()
+    return Manifest(str(tmp_path / "manifest.json"), version)
+
+def test_unchanged_blocks_keep_their_notes(tmp_path):
+    m = manifest(tmp_path, {"1. A": [("a", 1), ("b", 2)]})
+    assert m.plan("1. A", [digest("a"), digest("b")]) == [(1, False), (2, False)]
+
+def test_moved_blocks_keep_their_notes(tmp_path):
+    m = manifest(tmp_path, {"1. A": [("a", 1), ("b", 2), ("c", 3)]})
+    plan = m.plan("1. A", [digest("c"), digest("a"), digest("b")])
+    assert plan == [(3, False), (1, False), (2, False)]
+
+def test_changed_blocks_reuse_leftover_notes_in_order(tmp_path):
+    m = manifest(tmp_path, {"1. A": [("a", 1), ("b", 2), ("c", 3)]})
+    plan = m.plan("1. A", [digest("x"), digest("b"), digest("y"), digest("z")])
+    assert plan == [(1, True), (2, False), (3, True), (None, True)]
+
+def test_new_section_has_no_notes(tmp_path):
+    m = manifest(tmp_path, {"1. A": [("a", 1)]})
+    assert m.plan("2. B", [digest("a")]) == [(None, True)]
+
+def test_other_version_renders_everything_in_place(tmp_path):
+    manifest(tmp_path, {"1. A": [("a", 1), ("b", 2)]})
+    m = Manifest(str(tmp_path / "manifest.json"), 2)
+    assert m.stale
+    assert m.plan("1. A", [digest("a"), digest("b")]) == [(1, True), (2, True)]
+
+def test_deleted_notes_are_written_again(tmp_path):
+    m = manifest(tmp_path, {"1. A": [("a", 1), ("b", 2), ("c", 3)]})
+    assert m.note_ids() == {1, 2, 3}
+    m.retain({2})
+    plan = m.plan("1. A", [digest("a"), digest("b"), digest("c")])
+    assert plan == [(None, True), (2, False), (None, True)]
+
+def test_only_recorded_sections_are_saved(tmp_path):
+    m = manifest(tmp_path, {"1. A": [("a", 1)], "2. B": [("b", 2)]})
+    m.record("1. A", [digest("a")], [1])
+    m.save()
+    assert Manifest(m.filename, 1).old == {"1. A": [[digest("a"), 1]]}
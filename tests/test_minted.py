@@ -0,0 +1,74 @@
+import pytest
+from tex_cardify import parser
+from tex_cardify.cache import RenderCache
+from tex_cardify.manifest import Manifest
+from tex_cardify.minted import MintedMemo
+from tex_cardify.parser import RenderContext
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """The (language, code) snippets highlighted by pygments, in order"""
+    calls = []
+    render = parser.highlighter._render
+    def counting(language: str, code: str) -> str:
+        calls.append((language, code))
+        return render(language, code)
+    monkeypatch.setattr(parser.highlighter, "_render", counting)
+    return calls
+
+def document(*sections) -> str:
+    """sections: one list per section of the snippets of its blocks"""
+    return "".join(f"\\section{{S{i}}}\n" + "".join(
+        f"\\begin{{cstdef}}{{t}}\n\\begin{{minted}}{{python}}\n{code}\n\\end{{minted}}\n"
+        "\\end{cstdef}\nback\n" for code in codes)
+        for i, codes in enumerate(sections))
+
+def import_document(text: str, memo: MintedMemo) -> list:
+    context = RenderContext()
+    context.minted = memo
+    return list(parser.iter_cards(text, context))
+
+def test_distinct_snippets_are_misses(rendered):
+    memo = MintedMemo()
+    import_document(document(["a = 1", "b = 2"], ["c = 3"]), memo)
+    assert (memo.hits, memo.misses) == (0, 3)
+    assert len(rendered) == 3
+
+def test_repeated_snippets_are_hits(rendered):
+    memo = MintedMemo()
+    import_document(document(["a = 1", "a = 1"], ["a = 1"]), memo)
+    assert (memo.hits, memo.misses) == (2, 1)
+    assert len(rendered) == 1
+
+def test_stored_snippets_are_hits(rendered, tmp_path):
+    text = document(["a = 1", "b = 2"], ["c = 3"])
+    for _ in range(2):
+        store = RenderCache(str(tmp_path / "minted.sqlite3"))
+        memo = MintedMemo(store=store)
+        import_document(text, memo)
+        store.close()
+    assert (memo.hits, memo.misses) == (3, 0)
+    assert len(rendered) == 3
+
+def test_prefetch_is_bounded_by_the_memo_size(rendered):
+    # a section with more snippets than the memo holds is not highlighted
+    # twice, and the memo never grows past its size
+    memo = MintedMemo(size=2)
+    codes = [f"x = {i}" for i in range(5)]
+    cards = import_document(document(codes), memo)
+    assert len(rendered) == 5
+    assert (memo.hits, memo.misses) == (0, 5)
+    assert len(memo.entries) == 2 and not memo.fresh
+    assert all("codehilite" in card.front for card in cards)
+
+def test_only_changed_blocks_are_prefetched(rendered, tmp_path):
+    manifest = Manifest(str(tmp_path / "manifest.json"), parser.render_version)
+    context = RenderContext(manifest=manifest)
+    for note_id, card in enumerate(parser.iter_cards(document(["a = 1", "b = 2"]), context)):
+        card.note_id = note_id
+    manifest.save()
+    rendered.clear()
+    context = RenderContext(manifest=Manifest(manifest.filename, parser.render_version))
+    cards = list(parser.iter_cards(document(["a = 1", "c = 3"]), context))
+    assert len(cards) == 1
+    assert rendered == [("python", "\nc = 3\n")]
@@ -0,0 +1,23 @@
+import pytest
+
+from tex_cardify.parser import css_length, parse_options
+
+def test_parse_options():
+    assert parse_options(r"width=0.5\textwidth, frame") == {"width": r"0.5\textwidth", "frame": True}
+    assert parse_options("trim={1 2 3 4}, clip, angle = 90") == {
+        "trim": "1 2 3 4", "clip": True, "angle": "90"}
+    assert parse_options("a={b,c}") == {"a": "b,c"}
+    assert parse_options(None) == {}
+    assert parse_options("") == {}
+
+@pytest.mark.parametrize("length, css", [
+    (r"0.5\textwidth", "50%"),
+    (r"\linewidth", "100%"),
+    (r".25 \columnwidth", "25%"),
+    ("3cm", "3cm"),
+    ("12.5pt", "12.5pt"),
+    ("2\\baselineskip", None),
+    ("wide", None),
+])
+def test_css_length(length, css):
+    assert css_length(length) == css
@@ -0,0 +1,205 @@
+import os
+import re
+from mmap import mmap
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_all_start_methods, get_context
+from tex_cardify import parser
+from tex_cardify.parser import RenderContext
+
+def test_parsers_are_reentrant():
+    # a file handler that renders another card while the image parser is
+    # in the middle of restoring its own matches
+    def file_handler(name: str) -> str:
+        return parser.parser.parse(r"\textbf{" + name + r"} \includegraphics{c.png}")
+    html = parser.parser.parse(r"\includegraphics{a.png} $x$ \includegraphics{b.png}",
+                               RenderContext(file_handler))
+    assert html == ('<img src="<span class="tex-bold">a.png</span> ![](c.png)" /> \\(x\\) '
+                    '<img src="<span class="tex-bold">b.png</span> ![](c.png)" />')
+
+def test_registry_reset_drops_earlier_config():
+    registry = parser.CstRegistry(parser.default_environments)
+    registry.reset({"lem": {"label": "Lemma"}})
+    assert registry.get("lem*").label == "Lemma"
+    assert registry.reset({}) == []
+    assert registry.get("lem") is None
+    assert registry.get("thm").label == "Theorem"
+
+def test_registry_skips_malformed_entries():
+    registry = parser.CstRegistry(parser.default_environments)
+    skipped = registry.reset({"lem": {"class": "lem"}, "prop": "Proposition",
+                              "ax": {"label": "Axiom", "starred": False}})
+    assert skipped == ["lem", "prop"]
+    assert registry.get("lem") is None and registry.get("prop") is None
+    assert registry.get("ax").label == "Axiom" and registry.get("ax*") is None
+    assert registry.regex.match(r"\begin{cstax}{A}x\end{cstax}")
+
+document = r"""\section{A}
+\begin{cstdef}{x}$a$ \includegraphics{a.png}\tcblower b\end{cstdef}
+\subsection{B}
+\begin{cstthm}$c$\tcblower d\end{cstthm}
+\begin{cstrmk*}e\tcblower f\end{cstrmk*}
+"""
+
+def cards(context: RenderContext) -> list:
+    return [(card.deck, card.front, card.back)
+            for card in parser.iter_cards(document, context)]
+
+@pytest.mark.skipif("fork" not in get_all_start_methods(), reason="needs fork")
+def test_pool_renders_like_this_process():
+    with ProcessPoolExecutor(2, mp_context=get_context("fork")) as pool:
+        context = RenderContext(lambda name: "media/" + name, pool=pool)
+        assert cards(context) == cards(RenderContext(lambda name: "media/" + name))
+        assert context.pool is pool
+
+@pytest.mark.skipif("fork" not in get_all_start_methods(), reason="needs fork")
+def test_broken_pool_falls_back_to_this_process():
+    pool = ProcessPoolExecutor(1, mp_context=get_context("fork"))
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result()
+    context = RenderContext(lambda name: "media/" + name, pool=pool)
+    assert cards(context) == cards(RenderContext(lambda name: "media/" + name))
+    assert context.pool is None
+
+def test_parse_all_with_workers():
+    # spawned workers cannot import the test package, as they cannot import
+    # an add-on outside of Anki, and the blocks are rendered here instead
+    def handler_gen(deck: str):
+        return lambda front, back: written.append((deck, front, back)) or len(written)
+    written = []
+    parser.parse_all(document, handler_gen, lambda name: "media/" + name, workers=2)
+    assert written == cards(RenderContext(lambda name: "media/" + name))
+
+section_regex = re.compile(r"\\section\{(.*?)\}")
+
+def test_split_regex_keeps_repeated_headings_apart():
+    # the same heading twice used to split the text at the first one only
+    text = "intro \\section{A} a \\section{A} b"
+    pairs = [(None if pair.first is None else pair.first.start(), pair.second)
+             for pair in parser.split_regex(text, section_regex)]
+    assert pairs == [(None, "intro "), (6, " a "), (20, " b")]
+
+def test_split_spans_skips_blank_leading_text():
+    spans = list(parser.split_spans("  \n\\section{A}\\section{B}", section_regex))
+    assert [(match.group(1), start, end) for match, start, end in spans] == [
+        ("A", 14, 14), ("B", 25, 25)]
+
+def test_split_spans_over_bytes_and_a_range():
+    text = b"x \\section{A} a \\section{B} b"
+    spans = list(parser.split_spans(text, section_regex, 2, 16))
+    assert [(match.group(1), start, end) for match, start, end in spans] == [(b"A", 13, 16)]
+
+def protected_parser():
+    # x is replaced outside of <...>, and kept inside it
+    return parser.ProtectedEnvironmentParser(re.compile(r"<(.*?)>"),
+                                             lambda match: "[" + match.group(1) + "]",
+                                             parser.SimpleReplacementParser("x", "y"))
+
+def test_protected_environments_are_restored_in_place():
+    text = "x " + " ".join(f"<x{i}>" for i in range(12)) + " x"
+    assert protected_parser().parse(text) == (
+        "y " + " ".join(f"[x{i}]" for i in range(12)) + " y")
+
+def test_placeholders_of_other_parsers_are_left_alone():
+    first, second = protected_parser(), protected_parser()
+    placeholder = f"{second.prefix}0__"
+    assert first.parse("<x> " + placeholder) == "[x] " + placeholder
+    assert first.parse("x") == "y"
+
+def test_environments_and_commands_are_applied_in_one_scan():
+    text = r"\begin{center}\textbf{a \textit{b}} \underline{c}\end{center} \texttt{d}"
+    assert parser.environment_parser.parse(text) == (
+        '<div class="tex-center"><span class="tex-bold">a <span class="tex-italic">b'
+        '</span></span> <span class="tex-underline">c</span></div> '
+        '<span class="tex-code">d</span>')
+
+def test_environments_pair_like_the_lazy_regex():
+    # the first begin pairs with the first end, as the regexes did
+    text = r"\begin{itemize}\item a \begin{itemize}\item b\end{itemize}\end{itemize}"
+    assert parser.unprotected_parser.parse(text) == (
+        '<ul class="tex-itemize"><li style="display:none;"></li><li> a \\begin{itemize}'
+        '</li><li> b</li></ul>\\end{itemize}')
+    assert parser.environment_parser.parse(r"\end{proof} \begin{proof}") == (
+        r"\end{proof} \begin{proof}")
+
+@pytest.mark.parametrize("text, html", [
+    # a group in an argument no longer closes the command; the lazy regex
+    # gave <span class="tex-bold">a {b</span> c}
+    (r"\textbf{a {b} c}", '<span class="tex-bold">a {b} c</span>'),
+    # an unclosed command stays literal instead of taking the next "}"
+    (r"\textbf{a", r"\textbf{a"),
+    (r"\textbf{a \textit{b}", '\\textbf{a <span class="tex-italic">b</span>'),
+    # escaped braces are text
+    (r"\textbf{a \} b}", '<span class="tex-bold">a \\} b</span>'),
+    (r"\textbf{a \{ b}", '<span class="tex-bold">a \\{ b</span>'),
+    # an empty argument closes at once; the regex needed a character
+    (r"\paragraph{} x}", '<span class="tex-paragraph"></span> x}'),
+    # a command the parser does not know still balances its braces
+    (r"\textit{\color{blue}y}", '<span class="tex-italic">\\color{blue}y</span>'),
+    # stray braces stay as they are
+    (r"a } b { c", r"a } b { c"),
+])
+def test_command_arguments_balance_their_braces(text, html):
+    assert parser.unprotected_parser.parse(text) == html
+
+def test_multi_replacement_prefers_the_longest_literal():
+    replacer = parser.MultiReplacementParser({"\n": " ", "\n\n": "<br>"})
+    assert replacer.parse("a\n\n\nb\nc") == "a<br> b c"
+
+def test_multi_replacement_does_not_rescan_replacements():
+    # whatever the order of the literals, e.g. & after <
+    assert parser.literal_parser.parse("a < b & c") == "a &lt; b &amp; c"
+    replacer = parser.MultiReplacementParser({"a": "b", "b": "c"})
+    assert replacer.parse("ab") == "bc"
+
+def test_sections_are_numbered_per_parent():
+    text = (r"\begin{cstdef}{0}\end{cstdef}"
+            r"\section{A}\subsection{A1}\subsubsection*{A1a}\subsection{A2}"
+            r"\section{B}\subsection{B1}\begin{cstthm}\end{cstthm}")
+    sections = [(section.path, len(section.blocks))
+                for section in parser.iter_document(text)]
+    assert sections == [("", 1), ("1. A", 0), ("1. A::1. A1", 0),
+                        ("1. A::1. A1::1. A1a", 0), ("1. A::2. A2", 0),
+                        ("2. B", 0), ("2. B::1. B1", 1)]
+
+def test_sectioning_levels_may_be_skipped():
+    # a subsection right under a chapter, then a part above everything
+    text = r"\chapter{C}\subsection{S}\section{T}\part{P}\subsubsection{U}"
+    assert [section.path for section in parser.iter_document(text)][1:] == [
+        "1. C", "1. C::1. S", "1. C::2. T", "2. P", "2. P::1. U"]
+
+def test_heading_titles_may_hold_braces():
+    text = r"\section{Limit of $x^{2}$}\begin{cstdef}{a}\end{cstdef}"
+    assert [section.path for section in parser.iter_document(text.encode())] == [
+        "", "1. Limit of $x^{2}$"]
+
+def test_cards_are_rendered_as_they_are_consumed():
+    resolved = []
+    def file_handler(name: str) -> str:
+        resolved.append(name)
+        return name
+    text = (r"\section{A}\begin{cstdef}{a}\includegraphics{a.png}\end{cstdef}"
+            r"\section{B}\begin{cstdef}{b}\includegraphics{b.png}\end{cstdef}")
+    cards = parser.iter_cards(text, RenderContext(file_handler))
+    assert next(cards).deck == "1. A"
+    assert resolved == ["a.png"]
+    assert [card.deck for card in cards] == ["2. B"]
+    assert resolved == ["a.png", "b.png"]
+
+def test_open_source_maps_the_file(tmp_path):
+    text = "\\section{Über}\\begin{cstdef}{é}\\textbf{ü} $x$\\end{cstdef}ß\n"
+    filename = tmp_path / "notes.tex"
+    filename.write_text(text, encoding="utf-8")
+    with parser.open_source(str(filename)) as source:
+        assert isinstance(source, mmap)
+        mapped = [(card.deck, card.front, card.back) for card in parser.iter_cards(source)]
+    assert mapped == [(card.deck, card.front, card.back) for card in parser.iter_cards(text)]
+    assert mapped[0][0] == "1. Über"
+
+def test_open_source_of_an_empty_file(tmp_path):
+    filename = tmp_path / "empty.tex"
+    filename.write_bytes(b"")
+    with parser.open_source(str(filename), parser.IncludeResolver()) as source:
+        assert source == b""
+        assert list(parser.iter_cards(source)) == []